@@ -0,0 +1,99 @@
+"""
+Benchmark of the memory retained by the flows of a switch.
+
+Loads FLOWS flows, as parsed from the RESTCONF responses, from the config
+and operational datastores, flow manager and the switch into a switch for
+each way of keeping them, and prints the memory retained and the time
+taken. keep_raw keeps the raw flows like before the compact records.
+Every way runs in its own process, the memory is read from /proc so it
+only runs on Linux.
+
+Usage: python bench/flow_memory.py [FLOWS]
+
+"""
+from __future__ import print_function
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+STORES = ['keep_raw', 'objects', 'columnar']
+
+FLOW = {
+    'id': None, 'cookie': 0, 'table_id': 0, 'priority': 10,
+    'hard-timeout': 0, 'idle-timeout': 0,
+    'match': {'in-port': 1,
+              'ethernet-match': {'ethernet-type': {'type': 2048}}},
+    'instructions': {'instruction': [{'order': 0, 'apply-actions': {
+        'action': [{'order': 0, 'output-action': {
+            'output-node-connector': '2', 'max-length': 0}}]}}]},
+    'opendaylight-flow-statistics:flow-statistics': {
+        'packet-count': 1, 'byte-count': 64,
+        'duration': {'second': 1, 'nanosecond': 2}}}
+
+
+def cookie(i, version=1):
+    return (0x1f << 54) | (i << 32) | (version << 24)
+
+
+def rss():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS'):
+                return int(line.split()[1]) / 1024.0
+
+
+def load(store, count):
+    """Loads count flows in a switch, returns the MB retained and the time"""
+    from flowmanager.flow import Flow
+    from flowmanager.switch import Switch
+
+    text = json.dumps(FLOW)
+    gc.collect()
+    start = rss()
+    Flow.keep_raw = store == 'keep_raw'
+    switch = Switch({'name': 's1', 'dpid': '1'})
+    if store == 'columnar':
+        switch.set_flow_store(store)
+    started = time.time()
+    for source in ['of_config', 'of_operational', 'fm']:
+        for i in range(count):
+            # a new dict for every flow as json.loads of a response gives
+            flow = json.loads(text)
+            flow['id'] = 'f%d' % i
+            flow['cookie'] = cookie(i)
+            flow['table_id'] = i % 3
+            getattr(switch.get_flow(table=flow['table_id'], name=flow['id'],
+                                    cookie=flow['cookie']), 'add_' + source)(flow)
+    for i in range(count):
+        switch.get_flow(cookie=cookie(i)).add_switch(
+            {'id': None, 'cookie': cookie(i), 'table': str(i % 3),
+             'packets': '1', 'bytes': '64'})
+    flow = None
+    elapsed = time.time() - started
+    gc.collect()
+    return rss() - start, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    if len(sys.argv) > 2:
+        retained, elapsed = load(sys.argv[2], count)
+        print('{:.1f} {:.3f}'.format(retained, elapsed))
+        return
+
+    print('{} flows from 4 sources'.format(count))
+    for store in STORES:
+        output = subprocess.check_output(
+            [sys.executable, __file__, str(count), store])
+        retained, elapsed = [float(value) for value in output.split()]
+        print('{:9} {:7.0f} MB {:7.0f} bytes/flow, loaded in {:.2f}s'.format(
+            store, retained, retained * 1024 * 1024 / count, elapsed))
+
+
+if __name__ == '__main__':
+    main()
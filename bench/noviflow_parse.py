@@ -0,0 +1,162 @@
+"""
+Benchmark of the parsers of the Noviflow CLI output.
+
+Checks parse_flows and parse_groups return the same as the parsers of the
+CLI output before them, first on the dumps in bench/fixtures, then on a
+dump of FLOWS flows in the same format, and prints the time taken by both.
+
+Usage: python bench/noviflow_parse.py [FLOWS]
+
+"""
+from __future__ import print_function
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flowmanager.noviflow import parse_flows, parse_groups
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def reference_flows(lines):
+    """Parser of 'show status flow tableid all' of Noviflow.get_flows before
+    parse_flows"""
+    tableid = re.compile(r'\[TABLE\s+(\d+)\]', re.IGNORECASE)
+    flowid = re.compile(r'\[FLOW_ID\s*(\d+)\]', re.IGNORECASE)
+    cookies = re.compile(r'Cookie\s*=\s*(\S+)', re.IGNORECASE)
+    packetCounts = re.compile(r'Packet_count\s*=\s*(\d+)', re.IGNORECASE)
+    byteCounts = re.compile(r'Byte_count\s*=\s*(\d+)', re.IGNORECASE)
+
+    flows = []
+    current_flow = None
+    current_table = None
+    for line in lines:
+        match = tableid.findall(line)
+        if match:
+            current_table = match[0]
+            current_flow = None
+            continue
+
+        match = flowid.findall(line)
+        if match:
+            current_flow = {'id': match[0], 'table': current_table}
+            flows.append(current_flow)
+            continue
+
+        if current_flow is None:
+            continue
+
+        match = cookies.findall(line)
+        if match:
+            current_flow['cookie'] = int('0x{}'.format(match[0]), 16)
+            continue
+
+        match = packetCounts.findall(line)
+        if match:
+            current_flow['packets'] = match[0]
+            continue
+
+        match = byteCounts.findall(line)
+        if match:
+            current_flow['bytes'] = match[0]
+            continue
+    return flows
+
+
+def reference_groups(lines):
+    """Parser of 'show stats group groupid all' of Noviflow.get_groups before
+    parse_groups"""
+    groupIdRegex = re.compile(r'Group id:\s*(\d+)', re.IGNORECASE)
+    packetCountRegex = re.compile(
+        r'Reference count:\s*\d+\s*\S\s+Packet count:\s*(\d+)', re.IGNORECASE)
+    byteCountRegex = re.compile(r'Byte count:\s*(\d+)', re.IGNORECASE)
+
+    groups = []
+    current_group = None
+    for line in lines:
+        match = groupIdRegex.findall(line)
+        if match:
+            current_group = {'id': match[0]}
+            groups.append(current_group)
+            continue
+        elif current_group is None:
+            continue
+
+        match = packetCountRegex.findall(line)
+        if match:
+            current_group['packets'] = match[0]
+            if 'bytes' in current_group:
+                current_group = None
+            continue
+
+        match = byteCountRegex.findall(line)
+        if match:
+            current_group['bytes'] = match[0]
+            if 'packets' in current_group:
+                current_group = None
+            continue
+    return groups
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return f.read().splitlines()
+
+
+def make_flows(count):
+    """Returns the lines of a dump of count flows spread in 3 tables"""
+    lines = []
+    for table in range(3):
+        lines.append('[TABLE %d]' % table)
+        for flow in range(table, count, 3):
+            lines.extend([
+                '  [FLOW_ID %d]' % (flow + 1),
+                '    Timestamp = Mon Jan 1 10:00:00 2018',
+                '    Priority = 10',
+                '    Cookie = %x' % (0x1f00000000000000 + flow),
+                '    Packet_count = %d' % flow,
+                '    Byte_count = %d' % (flow * 64),
+                '    Match = in_port=1',
+                '    Instructions = apply: output 2'])
+    return lines
+
+
+def best_time(func, lines, runs=3):
+    best = None
+    for _ in range(runs):
+        start = time.time()
+        result = func(lines)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+    for name, parse, reference in [
+            ('noviflow_flows.txt', parse_flows, reference_flows),
+            ('noviflow_groups.txt', parse_groups, reference_groups)]:
+        lines = read_fixture(name)
+        parsed = parse(lines)
+        if parsed != reference(lines):
+            sys.exit('{}: parsed differently than before'.format(name))
+        print('{}: {} elements parsed as before'.format(name, len(parsed)))
+
+    lines = make_flows(count)
+    before, before_time = best_time(reference_flows, lines)
+    after, after_time = best_time(parse_flows, lines)
+    if before != after:
+        sys.exit('generated dump: parsed differently than before')
+    print('{} flows, {} lines'.format(len(after), len(lines)))
+    print('before:      {:.3f}s {:.0f} lines/s'.format(
+        before_time, len(lines) / before_time))
+    print('parse_flows: {:.3f}s {:.0f} lines/s'.format(
+        after_time, len(lines) / after_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Benchmark of the reconciliation of the flows and groups of a switch.
+
+Builds a switch with FLOWS flows and 1000 groups loaded from every source,
+a few of them missing in a source or with a different version, for each
+flow store. Checks reconcile_switch logs the same findings as checking
+every group and flow on its own like before, and prints the time taken by
+both.
+
+Usage: python bench/reconcile_switch.py [FLOWS]
+
+"""
+from __future__ import print_function
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flowmanager.flow import CALCULATED_EXCEPTIONS
+from flowmanager.reconcile import reconcile_switch
+from flowmanager.switch import Switch
+
+GROUPS = 1000
+
+
+def check_flow(flow):
+    """Logs the error of a flow like the check of every flow before
+    reconcile_switch"""
+    of_config, of_operational, switch_entry = flow.of_config, flow.of_operational, flow.switch
+    config = of_config is not None
+    operational = of_config is not None
+    switch = switch_entry is not None
+    fm = flow.fm is not None
+
+    if (config and of_config[0] > 1):
+        message = "flow %s duplicated in configuration. %s"
+    elif (of_operational is not None and of_operational[0] > 1):
+        message = "flow %s duplicated in operational. %s"
+    elif (switch and switch_entry[0] > 1):
+        message = "flow %s duplicated in switch. %s"
+    elif (fm and flow.fm[0] > 1):
+        message = "flow %s duplicated in monitored. %s"
+    elif config and not switch:
+        message = "flow %s is not runnig in the switch. %s"
+    elif config and not operational:
+        message = "flow %s not found in operational datastore. %s"
+    elif config and not fm:
+        message = "flow %s is not being monitored. %s"
+    elif config and not flow.calculated and str(of_config[2]) not in CALCULATED_EXCEPTIONS:
+        message = "flow %s not found in calculated flows. %s"
+    elif not config and switch:
+        message = "flow %s runnig in switch but not configured. %s"
+    elif not config and operational:
+        message = "flow %s found operational datastore but not in configuration. %s"
+    elif not config and not operational and not switch and fm:
+        message = "flow %s monitored but not running neither configured. %s"
+    elif config and switch and of_config[4] != switch_entry[4]:
+        message = "flow %s config and switch version is different. %s"
+    elif config and operational and of_config[4] != of_operational[4]:
+        message = "flow %s config and operational version is different. %s"
+    elif config and switch and of_config[3] != switch_entry[3]:
+        message = "flow %s config and switch id is different. %s"
+    elif config and operational and of_config[3] != of_operational[3]:
+        message = "flow %s config and operational id is different. %s"
+    else:
+        logging.debug("FLOW: OK: %s %s", flow.flowid, flow._get_info_msg())
+        return True
+    logging.error(message, flow.flowid, flow._get_info_msg())
+
+
+def check_group(group):
+    """Logs the error of a group like the check of every group before
+    reconcile_switch"""
+    if group.of_config and not group.switch:
+        message = "%s(%s) group %s is not runnig in the switch. %s"
+    elif group.of_config and not group.of_operational:
+        message = "%s(%s) group %s not found in operational datastore. %s"
+    elif group.of_config and not group.fm:
+        message = "%s(%s) group %s is not being monitored. %s"
+    elif group.of_config and not group.calculated:
+        message = "%s(%s) group %s not found in calculated groups. %s"
+    elif not group.of_config and group.switch:
+        message = "%s(%s) group %s runnig in switch but not configured. %s"
+    elif not group.of_config and group.of_operational:
+        message = "%s(%s) group %s found operational datastore but not in configuration. %s"
+    elif not group.of_config and not group.of_operational and not group.switch and group.fm:
+        message = "%s(%s) group %s monitored but not running neither configured. %s"
+    elif not group.of_config and group.calculated:
+        message = "%s(%s) group %s calculated but not configured. %s"
+    else:
+        logging.debug("GROUP: OK: %s %s", group.groupid,
+                      group._get_info_msg())
+        return True
+    logging.error(message, group.node, group.node_of_name,
+                  group.groupid, group._get_info_msg())
+
+
+def check_switch(switch):
+    """Checks every group and flow of a switch on its own"""
+    result = True
+    for group in switch.groups.values():
+        result = bool(check_group(group)) and result
+    flows = switch.flow_store.rows() if switch.flow_store is not None else switch.flows.values()
+    for flow in flows:
+        result = bool(check_flow(flow)) and result
+    return result
+
+
+def cookie(i, version=1):
+    return (0x1f << 54) | (i << 32) | (version << 24)
+
+
+def make_switch(store, count):
+    """Returns a switch with count flows, 1 in 100 with a mismatch"""
+    switch = Switch({'name': 's1', 'dpid': '1'})
+    if store:
+        switch.set_flow_store(store)
+    for i in range(count):
+        mismatch = i % 100
+        flow = {'id': 'f%d' % i, 'cookie': cookie(i), 'table_id': i % 3}
+        entry = switch.get_flow(table=i % 3, name=flow['id'], cookie=flow['cookie'])
+        entry.add_of_config(flow)
+        # the check of a flow missing only in operational raised, so every
+        # configured flow is operational
+        entry.add_of_operational(flow)
+        if mismatch != 2:
+            entry.add_fm(flow)
+        if mismatch != 3:
+            entry.mark_as_calculated()
+        if mismatch == 4:
+            # the switch runs another version of the flow
+            switch.get_flow(cookie=cookie(i, 2)).add_switch({'cookie': cookie(i, 2)})
+        elif mismatch:
+            switch.get_flow(cookie=cookie(i)).add_switch({'cookie': cookie(i)})
+        if mismatch == 1:
+            # the switch runs the flow twice
+            switch.get_flow(cookie=cookie(i)).add_switch({'cookie': cookie(i)})
+    for i in range(GROUPS):
+        group = switch.get_group(i)
+        group.add_of_config({})
+        group.add_of_operational({})
+        if i % 100:
+            group.add_switch({})
+        group.add_fm({})
+        group.mark_as_calculated()
+    return switch
+
+
+class Recorder(logging.Handler):
+
+    """Keeps the records logged"""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def take(self):
+        messages = sorted(record.getMessage() for record in self.records)
+        self.records = []
+        return messages
+
+
+def timed(func, switch):
+    start = time.time()
+    result = func(switch)
+    return result, time.time() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    recorder = Recorder()
+    logger = logging.getLogger()
+    logger.addHandler(recorder)
+    logger.setLevel(logging.INFO)
+
+    print('{} flows, {} groups'.format(count, GROUPS))
+    for store in [None, 'columnar']:
+        switch = make_switch(store, count)
+        before, before_time = timed(check_switch, switch)
+        before_findings = recorder.take()
+        after, after_time = timed(reconcile_switch, switch)
+        if (after, recorder.take()) != (before, before_findings):
+            sys.exit('{}: findings differ'.format(store or 'objects'))
+        print('{:9} {} findings, each element {:.2f}s, reconcile_switch {:.2f}s'.format(
+            store or 'objects', len(before_findings), before_time, after_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,12 +4,17 @@ This module contains the primitives to access controller information.
 
 """
 import logging
-import requests
+import threading
+import time
 import json
+from collections import OrderedDict
+from functools import partial
+import flowmanager.openflow as openflow
+import flowmanager.output as output
 from flowmanager.ssh import SSH
-from requests.auth import HTTPBasicAuth
 from flowmanager.utils import contains_filters
 from flowmanager.utils import check_mandatory_values
+from flowmanager.utils import run_tasks_in_order
 
 # support both version of REST API
 LUMINA_FLOW_MANAGER_PREFIX = 'lumina-flowmanager-'
@@ -48,9 +53,32 @@ class Controller(object):
         self.execute_local = not props.get('ip') and not props.get('sshuser')
         self.execute_local = True if self.ip == '127.0.0.1' else self.execute_local
 
+        # keep-alive connection pool settings
+        self.pool_connections = 4 if not props.get(
+            'pool_connections') else int(props['pool_connections'])
+        self.pool_maxsize = 10 if not props.get(
+            'pool_maxsize') else int(props['pool_maxsize'])
+        self.pool_block = bool(props.get('pool_block'))
+        self.pool_idle_timeout = 30 if props.get(
+            'pool_idle_timeout') is None else int(props['pool_idle_timeout'])
+
+        # eline/etree get-stats requests run concurrently
+        self.stats_workers = self.pool_maxsize if not props.get(
+            'stats_workers') else int(props['stats_workers'])
+        self.stats_timeout = self.timeout if not props.get(
+            'stats_timeout') else int(props['stats_timeout'])
+
         self.fm_prefix = None
         self.lumina = False
 
+        self.session = None
+        self.session_lock = threading.Lock()
+        self.session_last_used = 0
+        # requests using the session, it is never evicted under them
+        self.session_users = 0
+        self.http_stats = {'requests': 0, 'connections': 0,
+                           'sessions': 0, 'idle_evictions': 0}
+
     def is_running(self):
         raise Exception("to implement. check if process is up")
 
@@ -125,55 +153,136 @@ class Controller(object):
     def get_rest_sr_url(self):
         return self.get_operational_url() + '/' + 'sr:sr'
 
-    def http_get(self, url):
+    def get_session(self):
+        """Returns the pooled keep-alive session used for every REST call.
+
+        The session is re-created when no request has used it for more than
+        pool_idle_timeout seconds so stale connections are not reused. Every
+        call must be followed by release_session once the request is done.
+        """
+        with self.session_lock:
+            now = time.time()
+            if self.session and self.session_users == 0 and self.pool_idle_timeout > 0 and \
+                    now - self.session_last_used > self.pool_idle_timeout:
+                logging.debug("CONTROLLER: %s session idle for %ds, evicting pooled connections",
+                              self.name, now - self.session_last_used)
+                self.http_stats['idle_evictions'] += 1
+                self._close_session()
+
+            if not self.session:
+                # requests is slow to import, commands only talking to the
+                # switches never load it
+                import requests
+                from requests.adapters import HTTPAdapter
+                from requests.auth import HTTPBasicAuth
+                session = requests.Session()
+                session.auth = HTTPBasicAuth(self.user, self.password)
+                session.headers.update(DEFAULT_HEADERS)
+                session.verify = False
+                adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                                      pool_maxsize=self.pool_maxsize,
+                                      pool_block=self.pool_block)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.session = session
+                self.http_stats['sessions'] += 1
+
+            self.session_users += 1
+            self.session_last_used = now
+            return self.session
+
+    def release_session(self):
+        with self.session_lock:
+            self.session_users -= 1
+            self.session_last_used = time.time()
+
+    def get_http_stats(self):
+        """Returns request/connection counters of the keep-alive pool"""
+        with self.session_lock:
+            stats = dict(self.http_stats)
+            for pool in self._get_connection_pools():
+                stats['requests'] += pool.num_requests
+                stats['connections'] += pool.num_connections
+        stats['reused'] = max(stats['requests'] - stats['connections'], 0)
+        return stats
+
+    def close(self):
+        with self.session_lock:
+            self._close_session()
+
+    def _close_session(self):
+        if not self.session:
+            return
+        # keep the counters of the pools being discarded
+        for pool in self._get_connection_pools():
+            self.http_stats['requests'] += pool.num_requests
+            self.http_stats['connections'] += pool.num_connections
+        self.session.close()
+        self.session = None
+
+    def _get_connection_pools(self):
+        if not self.session:
+            return []
+        pools = []
+        for adapter in set(self.session.adapters.values()):
+            manager = getattr(adapter, 'poolmanager', None)
+            if manager is None:
+                continue
+            for key in manager.pools.keys():
+                pool = manager.pools.get(key)
+                if pool is not None:
+                    pools.append(pool)
+        return pools
+
+    def _request(self, method, url, stream=False, **kwargs):
+        session = self.get_session()
         try:
-            result = requests.get(url,
-                                  auth=HTTPBasicAuth(self.user, self.password),
-                                  headers=DEFAULT_HEADERS,
-                                  timeout=self.timeout,
-                                  verify=False)
-            return result
+            resp = getattr(session, method)(url, stream=stream, **kwargs)
+        except Exception:
+            self.release_session()
+            raise
+        if not stream:
+            self.release_session()
+            return resp
+
+        # a streamed response keeps its connection until it is closed
+        close = resp.close
+        released = []
+
+        def close_and_release():
+            close()
+            if not released:
+                released.append(True)
+                self.release_session()
+        resp.close = close_and_release
+        return resp
+
+    def http_get(self, url, stream=False):
+        import requests
+        try:
+            return self._request('get', url, stream=stream, timeout=self.timeout)
         except requests.exceptions.ConnectionError as errc:
             logging.error("%s", errc)
 
-    def http_post(self, url, data):
-        return requests.post(url,
-                             auth=HTTPBasicAuth(self.user,
-                                                self.password),
-                             data=data, headers=DEFAULT_HEADERS,
-                             timeout=self.timeout,
-                             verify=False)
+    def http_post(self, url, data, timeout=None):
+        return self._request('post', url, data=data,
+                             timeout=timeout or self.timeout)
 
     def http_put(self, url, data):
-        return requests.put(url,
-                            auth=HTTPBasicAuth(self.user,
-                                               self.password),
-                            data=data, headers=DEFAULT_HEADERS,
-                            timeout=self.timeout,
-                            verify=False)
+        return self._request('put', url, data=data, timeout=self.timeout)
 
     def http_delete(self, url):
-        return requests.delete(url,
-                               auth=HTTPBasicAuth(self.user,
-                                                  self.password),
-                               headers=DEFAULT_HEADERS,
-                               timeout=self.timeout,
-                               verify=False)
+        return self._request('delete', url, timeout=self.timeout)
 
     def get_flow_stats(self, filters=None, node_name=None):
-        resp = self.http_get(self.get_operational_openflow())
-        if resp is None or resp.status_code != 200 or resp.content is None:
+        nodes = openflow.stream_openflow_nodes(self, config=False)
+        if nodes is None:
             logging.error(
                 'no data found while trying to get openflow information')
             return
 
-        data = json.loads(resp.content)
-        if 'nodes' not in data or 'node' not in data['nodes']:
-            logging.error(
-                'no nodes found while trying to get openflow information')
-            return
-
-        for node in data['nodes']['node']:
+        node = None
+        for node in nodes:
             nodeid = node['id']
             # if not self.containsSwitch(nodeid):
             # continue
@@ -200,25 +309,30 @@ class Controller(object):
                             if stats is None:
                                 stats = flow.get(
                                     'opendaylight-flow-statistics:flow-statistics')
-                            if stats:
+                            if not stats:
+                                continue
+                            if output.is_jsonl():
+                                output.emit('flow-stats', {
+                                    'node': node['id'], 'table': tableid,
+                                    'flow': flow['id'], 'stats': stats})
+                            else:
                                 logging.info('\n%s\n%s', flowid,
                                              json.dumps(stats, indent=2))
 
+        if node is None:
+            logging.error(
+                'no nodes found while trying to get openflow information')
+
     def get_group_stats(self, filters=None, node_name=None):
 
-        resp = self.http_get(self.get_operational_openflow())
-        if resp is None or resp.status_code != 200 or resp.content is None:
+        nodes = openflow.stream_openflow_nodes(self, config=False)
+        if nodes is None:
             logging.error(
                 'no data found while trying to get openflow information')
             return
 
-        data = json.loads(resp.content)
-        if 'nodes' not in data or 'node' not in data['nodes']:
-            logging.error(
-                'no nodes found while trying to get openflow information')
-            return
-
-        for node in data['nodes']['node']:
+        node = None
+        for node in nodes:
 
             nodeid = node['id']
             # if not self.containsSwitch(nodeid):
@@ -246,171 +360,107 @@ class Controller(object):
                         stats = group.get(
                             'opendaylight-group-statistics:group-statistics')
 
-                    if stats:
+                    if not stats:
+                        continue
+                    if output.is_jsonl():
+                        output.emit('group-stats', {
+                            'node': node['id'], 'group': group['group-id'],
+                            'stats': stats})
+                    else:
                         logging.info(groupid)
                         logging.info(json.dumps(stats, indent=2))
 
-    def get_eline_stats(self, filters=None):
-        logging.debug(self.get_eline_url())
-        resp = self.http_get(self.get_eline_url())
-        if resp is None or resp.status_code != 200 or resp.content is None:
+        if node is None:
             logging.error(
-                'no data found while trying to get openflow information %s', resp.status_code)
-            return
-
-        data = json.loads(resp.content)
-        if 'elines' not in data or 'eline' not in data['elines'] or data['elines']['eline'] is None:
-            return
-
-        for eline in data['elines']['eline']:
-            if contains_filters(filters, eline['name']):
-                print 'eline: ' + eline['name']
-                resp = self._http_post(self._get_operations_url(
-                ) + REST_URL_ELINE_STATS, '{"input":{"name": "' + eline['name'] + '"}}')
-                print json.dumps(json.loads(resp.content), indent=2)
+                'no nodes found while trying to get openflow information')
 
-    def get_eline_summary(self, filters=None):
+    def get_eline_stats(self, filters=None):
+        elines = self._get_services('eline', openflow.get_elines, filters)
+        if elines is None:
+            return False
 
-        resp = self.http_get(self.get_eline_url())
-        if resp is None or resp.status_code != 200 or resp.content is None:
-            logging.error(
-                'no data found while trying to get openflow information %s', resp.status_code)
-            return
+        def show(result):
+            _show_service_stats('eline', elines[result.key]['name'], result.value)
 
-        data = json.loads(resp.content)
-        if 'elines' not in data or 'eline' not in data['elines'] or data['elines']['eline'] is None:
-            return
+        return self._run_service_stats('eline', elines, show)
 
-        for eline in data['elines']['eline']:
-            if contains_filters(filters, eline['name']):
-                resp = self._http_post(self._get_operations_url(
-                ) + REST_URL_ELINE_STATS, '{"input":{"name": "' + eline['name'] + '"}}')
-                if resp is None or resp.status_code != 200 or resp.content is None:
-                    print 'ERROR: cannot get stats for eline {}'.format(eline['name'])
-                    continue
+    def get_eline_summary(self, filters=None):
+        elines = self._get_services('eline', openflow.get_elines, filters)
+        if elines is None:
+            return False
+        paths = _get_by_name(openflow.get_paths(
+            self, config=True, use_cache=False))
 
-                eline_stats = json.loads(resp.content)
-                stats_output = eline_stats.get('output')
-                state = None if not stats_output else stats_output.get('state')
-                successful = bool(state.get('successful')
-                                  ) if state and 'successful' in state else False
-                error_msg = state.get('message') if state else ''
-                code = state.get('code') if state else -1
-                msg = 'state:OK' if successful else 'state: KO code:{} message:{}'.format(
-                    code, error_msg)
-                print "eline: '" + eline['name'] + "' " + msg
-
-                resp = self._http_get(self._get_config_url(
-                ) + REST_URL_PATH + '/path/{}'.format(eline['path-name']))
-                if resp is None or resp.status_code != 200 or resp.content is None:
-                    print 'ERROR: cannot get path for eline {}'.format(eline['name'])
-                    continue
+        def show(result):
+            summary = _get_eline_summary(elines[result.key], result.value, paths)
+            if output.is_jsonl():
+                output.emit('eline-summary', summary)
+            else:
+                _print_eline_summary(summary)
 
-                # get endpoint names
-                eline_path = json.loads(resp.content)
-                e1 = eline_path['path'][0]['endpoint1']
-                e1Name = e1['node'] if e1 and 'node' in e1 else ''
-                e2 = eline_path['path'][0]['endpoint2']
-                e2Name = e2['node'] if e2 and 'node' in e1 else ''
-
-                # get endpoint ingress/egress packets
-                e1s = stats_output.get('endpoint1') if stats_output else None
-                e1si = e1s.get('ingress') if e1s else None
-                e1sip = e1si.get('statistics').get(
-                    'packet-count') if e1si and e1si.get('statistics') else -1
-                e1se = e1s.get('egress') if e1s else None
-                e1sep = e1se.get('statistics').get(
-                    'packet-count') if e1se and e1se.get('statistics') else -1
-                e2s = stats_output.get('endpoint2') if stats_output else None
-                e2si = e2s.get('ingress') if e2s else None
-                e2sip = e2si.get('statistics').get(
-                    'packet-count') if e2si and e2si.get('statistics') else -1
-                e2se = e2s.get('egress') if e2s else None
-                e2sep = e2se.get('statistics').get(
-                    'packet-count') if e2se and e2se.get('statistics') else -1
-
-                print "\tfrom '{}' (packets {}) to '{}' (packets {})".format(e1Name, e1sip, e2Name, e2sep)
-                print "\tfrom '{}' (packets {}) to '{}' (packets {})".format(e2Name, e2sip, e1Name, e1sep)
-                print ""
+        return self._run_service_stats('eline', elines, show)
 
     def get_etree_stats(self, filters=None):
+        etrees = self._get_services('etree', openflow.get_etrees, filters)
+        if etrees is None:
+            return False
 
-        resp = self.http_get(self.get_etree_url())
-        if resp is None or resp.status_code != 200 or resp.content is None:
-            logging.error(
-                'no data found while trying to get openflow information %s', resp.status_code)
-            return
-
-        data = json.loads(resp.content)
-        if 'etrees' not in data or 'etree' not in data['etrees'] or data['etrees']['etree'] is None:
-            return
+        def show(result):
+            _show_service_stats('etree', etrees[result.key]['name'], result.value)
 
-        for etree in data['etrees']['etree']:
-            if contains_filters(filters, etree['name']):
-                print 'etree: ' + etree['name']
-                resp = self._http_post(self._get_operations_url(
-                ) + REST_URL_ETREE_STATS, '{"input":{"name": "' + etree['name'] + '"}}')
-                print json.dumps(json.loads(resp.content), indent=2)
+        return self._run_service_stats('etree', etrees, show)
 
     def get_etree_summary(self, filters=None):
+        etrees = self._get_services('etree', openflow.get_etrees, filters)
+        if etrees is None:
+            return False
+        treepaths = _get_by_name(openflow.get_treepaths(
+            self, config=True, use_cache=False))
 
-        resp = self.http_get(self.get_etree_url())
-        if resp is None or resp.status_code != 200 or resp.content is None:
-            logging.error(
-                'no data found while trying to get openflow information %s', resp.status_code)
-            return
-
-        data = json.loads(resp.content)
-        if 'etrees' not in data or 'etree' not in data['etrees'] or data['etrees']['etree'] is None:
-            return
-
-        for etree in data['etrees']['etree']:
-            if contains_filters(filters, etree['name']):
-
-                resp = self._http_post(self._get_operations_url(
-                ) + REST_URL_ETREE_STATS, '{"input":{"name": "' + etree['name'] + '"}}')
-                if resp is None or resp.status_code != 200 or resp.content is None:
-                    print 'ERROR: cannot get stats for etree {}'.format(etree['name'])
-                    continue
-
-                etree_stats = json.loads(resp.content)
-                stats_output = etree_stats.get('output')
-                state = None if not stats_output else stats_output.get('state')
-                successful = bool(state.get('successful')
-                                  ) if state and 'successful' in state else False
-                error_msg = state.get('message') if state else ''
-                code = state.get('code') if state else -1
-                msg = 'state:OK' if successful else 'state: KO code:{} message:{}'.format(
-                    code, error_msg)
-                print "etree: '" + etree['name'] + "' " + msg
-
-                resp = self._http_get(self._get_config_url(
-                ) + REST_URL_TREEPATH + '/treepath/{}'.format(etree['treepath-name']))
-                if resp is None or resp.status_code != 200 or resp.content is None:
-                    print 'ERROR: cannot get treepath for etree {}'.format(etree['name'])
-                    continue
-
-                # get endpoint names
-                etree_path = json.loads(resp.content)
-                root = etree_path['treepath'][0]['root']
-                rootName = root['node'] if root and 'node' in root else ''
-
-                # get root/leaves ingress/egress packets
-                ri = stats_output.get('ingress') if stats_output else None
-                rip = ri.get('statistics').get(
-                    'packet-count') if ri and ri.get('statistics') else -1
-                if not stats_output or not stats_output.get('leaf-statistics') or len(stats_output.get('leaf-statistics')) <= 0:
-                    print 'ERROR: leaves not found in etree'
-                    continue
+        def show(result):
+            summary = _get_etree_summary(etrees[result.key], result.value, treepaths)
+            if output.is_jsonl():
+                output.emit('etree-summary', summary)
+            else:
+                _print_etree_summary(summary)
 
-                for leaf in stats_output.get('leaf-statistics'):
-                    leafName = leaf.get('node')
-                    leafe = leaf.get('egress')
-                    leafep = leafe.get('statistics').get(
-                        'packet-count') if leafe and leafe.get('statistics') else -1
-                    print "\tfrom '{}' (packets {}) to '{}' (packets {})".format(rootName, rip, leafName, leafep)
+        return self._run_service_stats('etree', etrees, show)
 
-                print ""
+    def _get_services(self, service, get_services, filters):
+        """Returns the services matching the filters, None if none found"""
+        services = get_services(self, use_cache=False)
+        if services is None:
+            logging.error(
+                'no data found while trying to get %s information', service)
+            return None
+        return [s for s in services if contains_filters(filters, s['name'])]
+
+    def _run_service_stats(self, service, services, show):
+        """Requests the stats of the services concurrently, calling show
+        with their results in the order of services"""
+        url = self.get_operations_fm_url(service + ':get-stats')
+        tasks = [(index, partial(self._get_service_stats, url, s['name']))
+                 for index, s in enumerate(services)]
+        start = time.time()
+        results = run_tasks_in_order(tasks, show, max_workers=self.stats_workers,
+                                     timeout=self.stats_timeout)
+        for result in results:
+            if result.timed_out:
+                logging.debug("CONTROLLER: %s %s stats timed out",
+                              service, services[result.key]['name'])
+            elif result.error is not None:
+                logging.debug("CONTROLLER: %s %s stats failed: %s", service,
+                              services[result.key]['name'], result.error)
+        logging.debug("CONTROLLER: %s %s stats requested in %.2f seconds",
+                      len(services), service, time.time() - start)
+        return all(result.value is not None for result in results)
+
+    def _get_service_stats(self, url, name):
+        resp = self.http_post(url, json.dumps({'input': {'name': name}}),
+                              timeout=self.stats_timeout)
+        if resp is None or resp.status_code != 200 or not resp.content:
+            return None
+        return json.loads(resp.content)
 
     def execute_command_controller(self, command):
         SSHobj = SSH(self.ip, self.sshuser, self.sshport, self.sshpassword)
@@ -450,16 +500,27 @@ class Controller(object):
 
     def get_sr_summary_all(self, switches):
         srnodes = self._get_sr_nodes_paths(switches)
+        if srnodes is None:
+            logging.error('no segment routing paths found')
+            return
 
+        # statistics are fetched once and sub-paths are shared by the pairs
+        stats = self._get_sr_stats(srnodes)
+        lines = {}
+        result = True
         nodeslist = srnodes.keys()
         for fromindex in range(len(nodeslist) - 1):
             for toindex in range(fromindex + 1, len(nodeslist)):
-                self.get_sr_summary(
-                    nodeslist[fromindex], nodeslist[toindex], srnodes)
+                result = False if not self.get_sr_summary(
+                    nodeslist[fromindex], nodeslist[toindex], srnodes, stats, lines) else result
+        return result
 
-    def get_sr_summary(self, source, destination, srnodes=None):
+    def get_sr_summary(self, source, destination, srnodes=None, stats=None, lines=None):
         if srnodes is None:
             srnodes = self._get_sr_nodes_paths()
+            if srnodes is None:
+                logging.error('no segment routing paths found')
+                return
 
         source = str(source)
         if not source.startswith('openflow:'):
@@ -472,7 +533,8 @@ class Controller(object):
                         source = nodeid
                         break
         if not source.startswith('openflow:'):
-            print "ERROR: source {} not found".format(source)
+            _show_sr_error(source, destination,
+                           "source {} not found".format(source))
             return
 
         destination = str(destination)
@@ -486,46 +548,141 @@ class Controller(object):
                         destination = nodeid
                         break
         if not destination.startswith('openflow:'):
-            print "ERROR: destination {} not found".format(destination)
+            _show_sr_error(source, destination,
+                           "destination {} not found".format(destination))
             return
 
-        if destination not in srnodes[source]['primary-paths']:
-            print "ERROR: source {} cannot reach destination {}".format(source, destination)
+        if source not in srnodes or destination not in srnodes[source]['primary-paths']:
+            _show_sr_error(source, destination, "source {} cannot reach destination {}".format(
+                source, destination))
             return
 
         if destination == source:
-            print "ERROR: source {} and destination {} cannot be the same".format(source, destination)
+            _show_sr_error(source, destination, "source {} and destination {} cannot be the same".format(
+                source, destination))
             return
 
+        if stats is None:
+            stats = self._get_sr_stats(srnodes)
+        hops = self._get_sr_path_lines(source, destination, srnodes, stats,
+                                       {} if lines is None else lines)
+        if output.is_jsonl():
+            output.emit('sr-summary', OrderedDict([
+                ('source', source), ('destination', destination),
+                ('hops', [dict(hop, depth=tabs) for tabs, hop in hops])]))
+            return True
+
         print "SR packects from: {} to: {}".format(source, destination)
-        sources = [{source: 1}]
-        while len(sources) > 0:
-            current = sources[0].keys()[0]
-            tabs = sources[0][current]
-            del sources[0]
-
-            srnode = srnodes[current]['primary-paths']
-            if destination not in srnode:
-                print "ERROR: {} cannot reach destination {}".format(current, destination)
-                continue
+        for tabs, hop in hops:
+            if tabs is None:
+                print "ERROR: " + hop['error']
+            else:
+                print '\t' * (tabs + 1) + " node: ({}) flow packets ({}) group packets ({})".format(
+                    hop['node'], hop['flow_packets'], hop['group_packets'])
+        print ""
+        return True
 
-            srdest = srnode[destination]
-            print "{} node: ({}) flow packets ({}) group packets ({})".format('\t' * tabs, current, self.get_flow_stats(srnode[destination]['flow-id']), self.get_group_stats(srnode[destination]['group-id']))
-            hops = srnode[destination].get('next-hops')
-            if not hops:
-                continue
-            for hop in hops:
-                if hop != destination:
-                    sources.insert(0, {hop: tabs + 1})
+    def _get_sr_path_lines(self, current, destination, srnodes, stats, lines, visiting=()):
+        """Returns the (indentation, hop) lines of the path from a node to
+        a destination, lines memoizes them by node and destination"""
+        return self._walk_sr_path(current, destination, srnodes, stats, lines, visiting)[0]
+
+    def _walk_sr_path(self, current, destination, srnodes, stats, lines, visiting):
+        """Returns the lines of the path from a node and the hops it met.
+
+        Hops being visited are pruned to break cycles, so a memoized path is
+        only reused when the same hops it met are being visited.
+        """
+        key = (current, destination)
+        if key in lines:
+            result, met, pruned = lines[key]
+            if met.intersection(visiting) == pruned:
+                return result, met
+
+        met = set()
+        paths = srnodes[current]['primary-paths'] if current in srnodes else {}
+        if destination not in paths:
+            result = [(None, {'error': "{} cannot reach destination {}".format(
+                current, destination)})]
+        else:
+            flows, groups = stats
+            path = paths[destination]
+            result = [(0, {'node': current,
+                           'flow_packets': _get_packets(flows, path.get('flow-id')),
+                           'group_packets': _get_packets(groups, path.get('group-id'))})]
+            # hops are walked in reverse order, as a stack would
+            for hop in reversed(path.get('next-hops') or []):
+                if hop == destination:
+                    continue
+                met.add(hop)
+                if hop in visiting:
+                    continue
+                hop_lines, hop_met = self._walk_sr_path(
+                    hop, destination, srnodes, stats, lines, visiting + (current,))
+                met.update(hop_met)
+                result.extend((tabs if tabs is None else tabs + 1, line)
+                              for tabs, line in hop_lines)
+        lines[key] = (result, met, met.intersection(visiting))
+        return result, met
+
+    def _get_sr_stats(self, srnodes):
+        """Returns the packet counts of the flows and groups of the SR paths
+        by their ids, reading the operational inventory once"""
+        flow_ids = set()
+        group_ids = set()
+        for srnode in srnodes.values():
+            for path in srnode['primary-paths'].values():
+                flow_ids.add(path.get('flow-id'))
+                group_ids.add(path.get('group-id'))
+
+        flows = {}
+        groups = {}
+        nodes = openflow.stream_openflow_nodes(self, config=False)
+        if nodes is None:
+            logging.error(
+                'no data found while trying to get openflow information')
+            return flows, groups
 
-        print ""
+        for node in nodes:
+            tables = node.get('flow-node-inventory:table')
+            if tables is None:
+                tables = node.get('table')
+            for table in tables or []:
+                for flow in table.get('flow') or []:
+                    flowid = 'node/{}/table/{}/flow/{}'.format(
+                        node['id'], table['id'], flow['id'])
+                    if flowid not in flow_ids:
+                        continue
+                    stats = flow.get('flow-statistics')
+                    if stats is None:
+                        stats = flow.get(
+                            'opendaylight-flow-statistics:flow-statistics')
+                    if stats:
+                        flows[flowid] = stats.get('packet-count')
+
+            thegroups = node.get('flow-node-inventory:group')
+            if thegroups is None:
+                thegroups = node.get('group')
+            for group in thegroups or []:
+                groupid = 'node/{}/group/{}'.format(
+                    node['id'], group['group-id'])
+                if groupid not in group_ids:
+                    continue
+                stats = group.get('group-statistics')
+                if stats is None:
+                    stats = group.get(
+                        'opendaylight-group-statistics:group-statistics')
+                if stats:
+                    groups[groupid] = stats.get('packet-count')
+
+        return flows, groups
 
-    def _get_sr_nodes_paths(self, switches):
+    def _get_sr_nodes_paths(self, switches=None):
         srnodes = {}
         resp = self.http_get(self.get_operational_url(
         ) + '/network-topology:network-topology/topology/flow:1:sr')
         if resp is None or resp.status_code != 200 or resp.content is None:
-            logging.error('Error: %s', resp.status_code)
+            logging.error('Error: %s', resp.status_code if resp is not None else 'no response')
             return None
         logging.debug('Response Status %s Size: %d',
                       resp.status_code, len(resp.content))
@@ -539,7 +696,7 @@ class Controller(object):
 
         for node in nodes:
             nodeid = node['node-id']
-            if not nodeid in switches:
+            if switches is not None and not nodeid in switches:
                 continue
             brocadesr = node.get('brocade-bsc-sr:sr')
             # brocadesr = node.get(self.get_rest_sr_url)
@@ -588,15 +745,10 @@ class Controller(object):
 
     def get_node_summary(self, switches, node_name=None):
         logging.debug(self.get_operational_openflow())
-        resp = self.http_get(self.get_operational_openflow())
-        if resp is None or resp.status_code != 200 or resp.content is None:
+        nodes = openflow.stream_openflow_nodes(self, config=False)
+        if nodes is None:
             logging.error(
-                'no data found while trying to get openflow information %s', resp.status_code)
-            return
-        logging.debug(len(resp.content))
-        data = json.loads(resp.content)
-        if 'nodes' not in data or 'node' not in data['nodes']:
-            print 'ERROR: no nodes found while trying to get openflow information'
+                'no data found while trying to get openflow information')
             return
 
         result = []
@@ -604,7 +756,8 @@ class Controller(object):
         total_ports = 0
         total_ports_up = 0
 
-        for node in data['nodes']['node']:
+        node = None
+        for node in nodes:
             nodeid = node['id']
             logging.debug(nodeid, switches)
             if not nodeid in switches:
@@ -659,6 +812,22 @@ class Controller(object):
             total_ports_up += num_ports_up
             result.append({'id': nodeid, 'ports': rconnectors,
                            'total_ports': num_ports, 'total_ports_up': num_ports_up})
+            if output.is_jsonl():
+                output.emit('node-summary', result[-1])
+
+        if node is None:
+            if output.is_jsonl():
+                output.emit('node-summary-total', {
+                    'error': 'no nodes found while trying to get openflow information'})
+            else:
+                print 'ERROR: no nodes found while trying to get openflow information'
+            return
+
+        if output.is_jsonl():
+            output.emit('node-summary-total', {
+                'switches': len(result), 'total_ports': total_ports,
+                'total_ports_up': total_ports_up, 'speeds': rspeed})
+            return True
 
         print "Total number of switches: {}".format(len(result))
         print "Total number of ports: {}".format(total_ports)
@@ -671,3 +840,133 @@ class Controller(object):
             print "\tSwitch: {}\tTotal ports: {}\tLive port: {}".format(node.get('id'), node.get('total_ports'), node.get('total_ports_up'))
             for connector in node.get('ports'):
                 print "\t\tport: {} \tlive: {}\tspeed: {}".format(connector.get('port'), connector.get('up'), connector.get('speed'))
+        return True
+
+
+def _show_sr_error(source, destination, message):
+    if output.is_jsonl():
+        output.emit('sr-summary', OrderedDict([
+            ('source', source), ('destination', destination), ('error', message)]))
+    else:
+        print "ERROR: " + message
+
+
+def _get_packets(stats, elementid):
+    packets = stats.get(elementid)
+    return 'unknown' if packets is None else packets
+
+
+def _get_by_name(elements):
+    return dict((element['name'], element) for element in elements or [] if 'name' in element)
+
+
+def _show_service_stats(service, name, stats):
+    if output.is_jsonl():
+        output.emit(service + '-stats', {'name': name, 'stats': stats} if stats is not None else
+                    {'name': name, 'error': 'cannot get stats for {} {}'.format(service, name)})
+        return
+    print service + ': ' + name
+    if stats is None:
+        print 'ERROR: cannot get stats for {} {}'.format(service, name)
+        return
+    print json.dumps(stats, indent=2)
+
+
+def _get_state(stats_output):
+    """Returns the state of a get-stats output"""
+    state = None if not stats_output else stats_output.get('state')
+    return {'successful': bool(state.get('successful')) if state and 'successful' in state else False,
+            'code': state.get('code') if state else -1,
+            'message': state.get('message') if state else ''}
+
+
+def _get_state_msg(state):
+    return 'state:OK' if state['successful'] else 'state: KO code:{} message:{}'.format(
+        state['code'], state['message'])
+
+
+def _get_eline_summary(eline, stats, paths):
+    """Returns the state and endpoint packets of an eline"""
+    summary = OrderedDict([('name', eline['name'])])
+    if stats is None:
+        summary['error'] = 'cannot get stats for eline {}'.format(eline['name'])
+        return summary
+
+    stats_output = stats.get('output')
+    summary['state'] = _get_state(stats_output)
+    eline_path = paths.get(eline.get('path-name'))
+    if eline_path is None:
+        summary['error'] = 'cannot get path for eline {}'.format(eline['name'])
+        return summary
+
+    for endpoint in ('endpoint1', 'endpoint2'):
+        element = eline_path.get(endpoint)
+        endpoint_stats = stats_output.get(endpoint) if stats_output else None
+        summary[endpoint] = {
+            'node': element['node'] if element and 'node' in element else '',
+            'ingress': _get_packet_count(endpoint_stats, 'ingress'),
+            'egress': _get_packet_count(endpoint_stats, 'egress')}
+    return summary
+
+
+def _print_eline_summary(summary):
+    if 'state' not in summary:
+        print 'ERROR: ' + summary['error']
+        return
+    print "eline: '" + summary['name'] + "' " + _get_state_msg(summary['state'])
+    if 'error' in summary:
+        print 'ERROR: ' + summary['error']
+        return
+
+    e1, e2 = summary['endpoint1'], summary['endpoint2']
+    print "\tfrom '{}' (packets {}) to '{}' (packets {})".format(e1['node'], e1['ingress'], e2['node'], e2['egress'])
+    print "\tfrom '{}' (packets {}) to '{}' (packets {})".format(e2['node'], e2['ingress'], e1['node'], e1['egress'])
+    print ""
+
+
+def _get_etree_summary(etree, stats, treepaths):
+    """Returns the state, root and leaves packets of an etree"""
+    summary = OrderedDict([('name', etree['name'])])
+    if stats is None:
+        summary['error'] = 'cannot get stats for etree {}'.format(etree['name'])
+        return summary
+
+    stats_output = stats.get('output')
+    summary['state'] = _get_state(stats_output)
+    etree_path = treepaths.get(etree.get('treepath-name'))
+    if etree_path is None:
+        summary['error'] = 'cannot get treepath for etree {}'.format(etree['name'])
+        return summary
+
+    root = etree_path.get('root')
+    summary['root'] = {'node': root['node'] if root and 'node' in root else '',
+                       'ingress': _get_packet_count(stats_output, 'ingress')}
+    leaves = stats_output.get('leaf-statistics') if stats_output else None
+    if not leaves:
+        summary['error'] = 'leaves not found in etree'
+        return summary
+    summary['leaves'] = [{'node': leaf.get('node'), 'egress': _get_packet_count(leaf, 'egress')}
+                         for leaf in leaves]
+    return summary
+
+
+def _print_etree_summary(summary):
+    if 'state' not in summary:
+        print 'ERROR: ' + summary['error']
+        return
+    print "etree: '" + summary['name'] + "' " + _get_state_msg(summary['state'])
+    if 'leaves' not in summary:
+        print 'ERROR: ' + summary['error']
+        return
+
+    root = summary['root']
+    for leaf in summary['leaves']:
+        print "\tfrom '{}' (packets {}) to '{}' (packets {})".format(root['node'], root['ingress'], leaf['node'], leaf['egress'])
+    print ""
+
+
+def _get_packet_count(stats, direction):
+    """Returns the packet-count of the ingress or egress stats, -1 if missing"""
+    element = stats.get(direction) if stats else None
+    return element.get('statistics').get(
+        'packet-count') if element and element.get('statistics') else -1
@@ -4,12 +4,26 @@ This module contains the primitives and methods for flows.
 """
 
 import logging
+from array import array
 
 CALCULATED_EXCEPTIONS = ['fm-sr-link-discovery']
 
 
+PREFIX_SHIFT = 54
+PREFIX_MASK = ((1 << 64) - 1) >> PREFIX_SHIFT << PREFIX_SHIFT
+
+
 def get_prefix(cookie):
-    return int(cookie) >> 54
+    return int(cookie) >> PREFIX_SHIFT
+
+
+def get_prefix_filter(prefix):
+    """Returns the (cookie, mask) pair matching the cookies with the prefix"""
+    return int(prefix) << PREFIX_SHIFT, PREFIX_MASK
+
+
+def has_prefix(cookie, prefix):
+    return prefix is None or cookie is None or get_prefix(cookie) == prefix
 
 
 def get_version(cookie):
@@ -20,133 +34,128 @@ def get_id(cookie):
     return (int(cookie) & 0x00FFFFFF00000000) >> 32
 
 
+def decode_cookies(cookies):
+    """Returns the prefix, id and version columns of a batch of cookies.
+
+    Cookies can be a list, with None for the flows without cookie, or an
+    array of integers. Each cookie is decoded once.
+    """
+    if not isinstance(cookies, array):
+        cookies = [int(cookie) if cookie is not None else None for cookie in cookies]
+        if None in cookies:
+            return ([cookie >> PREFIX_SHIFT if cookie is not None else None for cookie in cookies],
+                    [(cookie & 0x00FFFFFF00000000) >> 32 if cookie is not None else None for cookie in cookies],
+                    [(cookie & 0x00000000FF000000) >> 24 if cookie is not None else None for cookie in cookies])
+    return ([cookie >> PREFIX_SHIFT for cookie in cookies],
+            [(cookie & 0x00FFFFFF00000000) >> 32 for cookie in cookies],
+            [(cookie & 0x00000000FF000000) >> 24 for cookie in cookies])
+
+
+def _add_entry(entry, flow, decoded=None):
+    """Returns the compact (count, table, name, id, version) entry of a source.
+
+    Only the first flow of a source is described, later ones are counted.
+    decoded is the (id, version) of the cookie when it is already known.
+    """
+    if entry is not None:
+        return (entry[0] + 1,) + entry[1:]
+    if decoded is None:
+        cookie = flow.get('cookie')
+        decoded = (get_id(cookie), get_version(cookie)
+                   ) if cookie is not None else (None, None)
+    return (1, flow.get('table_id'), flow.get('id')) + tuple(decoded)
+
+
 class Flow(object):
 
+    """Flow found in the controller datastores, the switch or flow manager.
+
+    Each source keeps a compact entry instead of the flows it reported,
+    the raw flows are only kept when keep_raw is set to report them with
+    the errors.
+    """
+
+    __slots__ = ('node', 'node_of_name', 'cookie', 'table', 'name', 'calculated',
+                 'of_config', 'of_operational', 'switch', 'fm', 'raw')
+
+    keep_raw = False
+
     def __init__(self, node, node_of_name, cookie=None, table=None, name=None):
         self.node = node
         self.node_of_name = node_of_name
-        self.of_operational = []
-        self.of_config = []
-        self.switch = []
-        self.fm = []
+        self.of_operational = None
+        self.of_config = None
+        self.switch = None
+        self.fm = None
         self.calculated = False
+        self.raw = None
 
         self.cookie = cookie
         self.table = table
         self.name = name
 
+    def __str__(self):
+        return self.flowid
+
+    @property
+    def flowid(self):
+        node, node_of_name, table, name, cookie = self.node, self.node_of_name, self.table, self.name, self.cookie
         if table is not None and name is not None and cookie is not None:
-            self.flowid = "{}({})/table/{}/name/{}/id/{}/version/{}".format(
+            return "{}({})/table/{}/name/{}/id/{}/version/{}".format(
                 node, node_of_name, table, name, get_id(cookie), get_version(cookie))
         elif table is not None and name is not None:
-            self.flowid = "{}({})/table/{}/name/{}".format(node,
-                                                           node_of_name, table, name)
+            return "{}({})/table/{}/name/{}".format(node,
+                                                    node_of_name, table, name)
         else:
-            self.flowid = "{}({})/id/{}/version/{}".format(node,
-                                                           node_of_name, get_id(cookie), get_version(cookie))
-
-    def add_of_config(self, flow):
-        logging.debug("FLOW: %s marked as configured", self.flowid)
-        self.of_config.append(flow)
-        logging.debug(flow)
-        try:
-            self.of_config_id = get_id(flow['cookie'])
-            self.of_config_version = get_version(flow['cookie'])
-        except KeyError:
+            return "{}({})/id/{}/version/{}".format(node,
+                                                    node_of_name, get_id(cookie), get_version(cookie))
+
+    def _keep_raw(self, source, flow):
+        if self.keep_raw:
+            if self.raw is None:
+                self.raw = {}
+            self.raw.setdefault(source, []).append(flow)
+
+    def add_of_config(self, flow, decoded=None):
+        logging.debug("FLOW: %s marked as configured", self)
+        if 'cookie' not in flow:
             logging.error("KeyError, could not find cookie in table/0")
+        self.of_config = _add_entry(self.of_config, flow, decoded)
+        self._keep_raw('config', flow)
 
-    def add_of_operational(self, flow):
-        logging.debug("FLOW: %s marked as operational", self.flowid)
-        self.of_operational.append(flow)
-        self.of_operational_id = get_id(flow['cookie'])
-        self.of_operational_version = get_version(flow['cookie'])
+    def add_of_operational(self, flow, decoded=None):
+        logging.debug("FLOW: %s marked as operational", self)
+        self.of_operational = _add_entry(self.of_operational, flow, decoded)
+        self._keep_raw('operational', flow)
 
-    def add_switch(self, flow):
-        logging.debug("FLOW: %s marked as running in switch", self.flowid)
-        self.switch.append(flow)
-        self.switch_id = get_id(flow['cookie'])
-        self.switch_version = get_version(flow['cookie'])
+    def add_switch(self, flow, decoded=None):
+        logging.debug("FLOW: %s marked as running in switch", self)
+        self.switch = _add_entry(self.switch, flow, decoded)
+        self._keep_raw('switch', flow)
 
-    def add_fm(self, flow):
-        logging.debug("FLOW: %s marked as monitored", self.flowid)
-        self.fm.append(flow)
+    def add_fm(self, flow, decoded=None):
+        logging.debug("FLOW: %s marked as monitored", self)
+        self.fm = _add_entry(self.fm, flow, decoded)
+        self._keep_raw('monitored', flow)
 
     def mark_as_calculated(self):
-        logging.debug("FLOW: %s marked as calculated", self.flowid)
+        logging.debug("FLOW: %s marked as calculated", self)
         self.calculated = True
 
-    def check(self):
-        config = len(self.of_config) > 0
-        operational = len(self.of_config) > 0
-        switch = len(self.switch) > 0
-        fm = len(self.fm) > 0
-
-        if (len(self.of_config) > 1):
-            logging.error("flow %s duplicated in configuration. %s",
-                          self.flowid, self._get_info_msg())
-        elif (len(self.of_operational) > 1):
-            logging.error("flow %s duplicated in operational. %s",
-                          self.flowid, self._get_info_msg())
-        elif (len(self.switch) > 1):
-            logging.error("flow %s duplicated in switch. %s",
-                          self.flowid, self._get_info_msg())
-        elif (len(self.fm) > 1):
-            logging.error("flow %s duplicated in monitored. %s",
-                          self.flowid, self._get_info_msg())
-        elif config and not switch:
-            logging.error("flow %s is not runnig in the switch. %s",
-                          self.flowid, self._get_info_msg())
-        elif config and not operational:
-            logging.error("flow %s not found in operational datastore. %s",
-                          self.flowid, self._get_info_msg())
-        elif config and not fm:
-            logging.error("flow %s is not being monitored. %s",
-                          self.flowid, self._get_info_msg())
-        elif config and not self.calculated and str(self.of_config[0]['id']) not in CALCULATED_EXCEPTIONS:
-            logging.error("flow %s not found in calculated flows. %s",
-                          self.flowid, self._get_info_msg())
-        elif not config and switch:
-            logging.error("flow %s runnig in switch but not configured. %s",
-                          self.flowid, self._get_info_msg())
-        elif not config and operational:
-            logging.error("flow %s found operational datastore but not in configuration. %s",
-                          self.flowid, self._get_info_msg())
-        elif not config and not operational and not switch and fm:
-            logging.error("flow %s monitored but not running neither configured. %s",
-                          self.flowid, self._get_info_msg())
-        elif config and switch and self.of_config_version != self.switch_version:
-            logging.error("flow %s config and switch version is different. %s",
-                          self.flowid, self._get_info_msg())
-        elif config and operational and self.of_config_version != self.of_operational_version:
-            logging.error("flow %s config and operational version is different. %s",
-                          self.flowid, self._get_info_msg())
-        elif config and switch and self.of_config_id != self.switch_id:
-            logging.error("flow %s config and switch id is different. %s",
-                          self.flowid, self._get_info_msg())
-        elif config and operational and self.of_config_id != self.of_operational_id:
-            logging.error("flow %s config and operational id is different. %s",
-                          self.flowid, self._get_info_msg())
-        else:
-            logging.debug("FLOW: OK: %s %s", self.flowid, self._get_info_msg())
-            return True
-
     def _get_info_msg(self):
         msg = "{}({})".format(self.node, self.node_of_name)
-        if (len(self.of_config) > 0):
-            flow = self.of_config[0]
+        if self.of_config is not None:
+            _, table, name, flow_id, version = self.of_config
             msg = msg + ", " + "config table/{}/name/{}/id/{}/version/{}".format(
-                flow['table_id'], flow['id'], get_id(flow['cookie']), get_version(flow['cookie']))
-        if (len(self.of_operational) > 0):
-            flow = self.of_operational[0]
+                table, name, flow_id, version)
+        if self.of_operational is not None:
+            _, table, name, flow_id, version = self.of_operational
             msg = msg + ", " + "operational table/{}/name/{}/id/{}/version/{}".format(
-                flow['table_id'], flow['id'], get_id(flow['cookie']), get_version(flow['cookie']))
-        if (len(self.switch) > 0):
-            flow = self.switch[0]
+                table, name, flow_id, version)
+        if self.switch is not None:
             msg = msg + ", " + \
-                "switch id/{}/version/{}".format(
-                    get_id(flow['cookie']), get_version(flow['cookie']))
-        if (len(self.fm) > 0):
-            flow = self.fm[0]
-            msg = msg + ", " + "monitored name/{}".format(flow['id'])
+                "switch id/{}/version/{}".format(self.switch[3], self.switch[4])
+        if self.fm is not None:
+            msg = msg + ", " + "monitored name/{}".format(self.fm[2])
 
         return msg
@@ -0,0 +1,204 @@
+"""
+This module contains a columnar store for the flows of a switch.
+
+Instead of one Flow object per flow, the cookies, tables, per source ids,
+versions and counts and the switch counters are kept in typed arrays, one
+row per flow, with indexes by flow name and flow manager id.
+
+"""
+import logging
+from array import array
+from flowmanager.flow import Flow
+from flowmanager.flow import get_id
+from flowmanager.flow import get_version
+
+SOURCES = ('of_config', 'of_operational', 'switch', 'fm')
+
+try:
+    COOKIE_TYPE = 'Q'
+    array(COOKIE_TYPE)
+except ValueError:
+    # python 2 has no 'Q', unsigned long is 64 bits on LP64 platforms
+    COOKIE_TYPE = 'L'
+
+NONE = -1
+
+
+class FlowStore(object):
+
+    """Flows of a switch stored by columns.
+
+    Rows are returned as FlowRow views, which behave like Flow objects, so
+    the loaders and the checks work the same with both stores.
+    """
+
+    def __init__(self, node, node_of_name):
+        self.node = node
+        self.node_of_name = node_of_name
+        self.tables = []
+        self.names = []
+        self.cookies = array(COOKIE_TYPE)
+        self.has_cookie = array('B')
+        self.calculated = array('B')
+        self.counts = dict((source, array('H')) for source in SOURCES)
+        self.ids = dict((source, array('l')) for source in SOURCES)
+        self.versions = dict((source, array('h')) for source in SOURCES)
+        # table and name of the first flow of a source when they are not
+        # the ones of the row
+        self.source_tables = dict((source, {}) for source in SOURCES)
+        self.source_names = dict((source, {}) for source in SOURCES)
+        self.packets = array(COOKIE_TYPE)
+        self.bytes = array(COOKIE_TYPE)
+        self.rows_by_name = {}
+        self.rows_by_id = {}
+        self.raw = {}
+
+    def __len__(self):
+        return len(self.cookies)
+
+    def get_flow(self, table=None, name=None, cookie=None, fm_id=None):
+        """Returns the row of a flow as Switch.get_flow, adding it if needed"""
+        cookie = str(cookie) if cookie is not None else None
+        name = str(name) if name is not None else None
+        table = str(table) if table is not None else None
+
+        if not cookie and (not table or not name):
+            raise Exception('cookie or table and name is mandatory')
+
+        flow_name = "table/{}/name/{}".format(
+            table, name) if table is not None and name is not None else None
+        if fm_id is None and cookie is not None:
+            fm_id = get_id(cookie)
+
+        row = self.rows_by_name.get(flow_name) if flow_name else None
+        if row is None and fm_id is not None:
+            row = self.rows_by_id.get(fm_id)
+        if row is None:
+            row = self._add_row(table, name, cookie)
+            if flow_name:
+                self.rows_by_name[flow_name] = row
+            if fm_id is not None:
+                self.rows_by_id[fm_id] = row
+        return FlowRow(self, row)
+
+    def _add_row(self, table, name, cookie):
+        self.tables.append(table)
+        self.names.append(name)
+        self.cookies.append(int(cookie) if cookie is not None else 0)
+        self.has_cookie.append(cookie is not None)
+        self.calculated.append(False)
+        for source in SOURCES:
+            self.counts[source].append(0)
+            self.ids[source].append(NONE)
+            self.versions[source].append(NONE)
+        self.packets.append(0)
+        self.bytes.append(0)
+        return len(self.cookies) - 1
+
+    def add(self, source, row, flow, decoded=None):
+        """Records a flow reported by a source in a row.
+
+        decoded is the (id, version) of the cookie when it is already known.
+        """
+        count = self.counts[source][row]
+        self.counts[source][row] = count + 1
+        if Flow.keep_raw:
+            self.raw.setdefault(row, {}).setdefault(source, []).append(flow)
+        if count:
+            return
+        if decoded is None and flow.get('cookie') is not None:
+            decoded = get_id(flow['cookie']), get_version(flow['cookie'])
+        if decoded is not None and decoded[0] is not None:
+            self.ids[source][row], self.versions[source][row] = decoded
+        if source == 'switch':
+            # only the id and version of the switch flows are reported
+            self.packets[row] = int(flow.get('packets') or 0)
+            self.bytes[row] = int(flow.get('bytes') or 0)
+            return
+        table = flow.get('table_id')
+        if table is None or str(table) != self.tables[row]:
+            self.source_tables[source][row] = table
+        name = flow.get('id')
+        if name is None or str(name) != self.names[row]:
+            self.source_names[source][row] = name
+
+    def get_entry(self, source, row):
+        """Returns the (count, table, name, id, version) entry of Flow"""
+        count = self.counts[source][row]
+        if not count:
+            return None
+        flow_id = self.ids[source][row]
+        version = self.versions[source][row]
+        return (count, self.source_tables[source].get(row, self.tables[row]),
+                self.source_names[source].get(row, self.names[row]),
+                flow_id if flow_id != NONE else None,
+                version if version != NONE else None)
+
+    def get_entries(self, source):
+        """Returns the entries of get_entry by row for the rows of a source"""
+        tables, names = self.source_tables[source], self.source_names[source]
+        return dict((row, (count, tables.get(row, self.tables[row]), names.get(row, self.names[row]),
+                           flow_id if flow_id != NONE else None, version if version != NONE else None))
+                    for row, (count, flow_id, version) in enumerate(zip(
+                        self.counts[source], self.ids[source], self.versions[source]))
+                    if count)
+
+    def rows(self):
+        return [FlowRow(self, row) for row in xrange(len(self.cookies))]
+
+    def get_present(self, source):
+        """Returns the rows of the flows reported by a source"""
+        return set(row for row, count in enumerate(self.counts[source]) if count)
+
+    def get_skew(self, source, other):
+        """Returns the rows of the flows in two sources whose ids or versions
+        are different"""
+        return set(row for row, (count, other_count, flow_id, other_id, version, other_version) in enumerate(zip(
+            self.counts[source], self.counts[other], self.ids[source], self.ids[other],
+            self.versions[source], self.versions[other]))
+            if count and other_count and (flow_id != other_id or version != other_version))
+
+
+def _column(source):
+    return property(lambda self: self.store.get_entry(source, self.row))
+
+
+class FlowRow(Flow):
+
+    """View of a FlowStore row with the interface of Flow"""
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    node = property(lambda self: self.store.node)
+    node_of_name = property(lambda self: self.store.node_of_name)
+    table = property(lambda self: self.store.tables[self.row])
+    name = property(lambda self: self.store.names[self.row])
+    cookie = property(lambda self: str(self.store.cookies[self.row])
+                      if self.store.has_cookie[self.row] else None)
+    calculated = property(lambda self: bool(self.store.calculated[self.row]))
+    raw = property(lambda self: self.store.raw.get(self.row))
+    of_config = _column('of_config')
+    of_operational = _column('of_operational')
+    switch = _column('switch')
+    fm = _column('fm')
+
+    def add_of_config(self, flow, decoded=None):
+        if 'cookie' not in flow:
+            logging.error("KeyError, could not find cookie in table/0")
+        self.store.add('of_config', self.row, flow, decoded)
+
+    def add_of_operational(self, flow, decoded=None):
+        self.store.add('of_operational', self.row, flow, decoded)
+
+    def add_switch(self, flow, decoded=None):
+        self.store.add('switch', self.row, flow, decoded)
+
+    def add_fm(self, flow, decoded=None):
+        self.store.add('fm', self.row, flow, decoded)
+
+    def mark_as_calculated(self):
+        self.store.calculated[self.row] = True
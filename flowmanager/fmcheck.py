@@ -1,11 +1,14 @@
 """Flow Manager Testing Tools
 
 Usage:
-  fmcheck links [-srd] [--topology=FILE] [--controller=IP]...
-  fmcheck nodes [-srd] [--topology=FILE] [--controller=IP]...
-  fmcheck flows [-ad] [--topology=FILE] [--controller=IP]...
-  fmcheck roles [-d] [--topology=FILE] [--controller=IP]...
-  fmcheck sync-status [-d] [--topology=FILE] [--controller=IP]...
+  fmcheck links [-srd] [--format=FORMAT] [--topology=FILE] [--controller=IP]...
+  fmcheck nodes [-srd] [--format=FORMAT] [--topology=FILE] [--controller=IP]...
+  fmcheck flows [-ad] [--format=FORMAT] [--topology=FILE] [--controller=IP]...
+  fmcheck roles [-d] [--format=FORMAT] [--topology=FILE] [--controller=IP]...
+  fmcheck sync-status [-d] [--format=FORMAT] [--topology=FILE] [--controller=IP]...
+  fmcheck watch [<check>...] [-srad] [--interval=SECONDS] [--format=FORMAT] [--topology=FILE] [--controller=IP]...
+  fmcheck serve [-d] [--listen=ADDRESS] [--topology=FILE] [--controller=IP]...
+  fmcheck batch [<file>] [-d] [--format=FORMAT] [--topology=FILE] [--controller=IP]...
   fmcheck reboot-random-controller [-d] [--topology=FILE]
   fmcheck reboot-controller <name> [-d] [--topology=FILE]
   fmcheck reboot-controller-all [-d] [--topology=FILE]
@@ -27,25 +30,25 @@ Usage:
   fmcheck delete-groups <name> [-d] [--topology=FILE]
   fmcheck delete-random-flows [-d] [--topology=FILE]
   fmcheck delete-flows <name> [-d] [--topology=FILE]
-  fmcheck get-flow-stats-all [-d] [--topology=FILE]
-  fmcheck get-flow-stats <filter>... [-d] [--topology=FILE]
-  fmcheck get-flow-node-stats-all <node> [-d] [--topology=FILE]
-  fmcheck get-flow-node-stats <node> <filter>... [-d] [--topology=FILE]
-  fmcheck get-group-stats-all [-d] [--topology=FILE]
-  fmcheck get-group-stats <filter>... [-d] [--topology=FILE]
-  fmcheck get-group-node-stats-all <node> [-d] [--topology=FILE]
-  fmcheck get-group-node-stats <node> <filter>... [-d] [--topology=FILE]
-  fmcheck get-eline-stats-all [-d] [--topology=FILE]
-  fmcheck get-eline-stats <filter>... [-d] [--topology=FILE]
-  fmcheck get-eline-summary-all [-d] [--topology=FILE]
-  fmcheck get-eline-summary <filter>... [-d] [--topology=FILE]
-  fmcheck get-etree-stats-all [-d] [--topology=FILE]
-  fmcheck get-etree-stats <filter>... [-d] [--topology=FILE]
-  fmcheck get-etree-summary-all [-d] [--topology=FILE]
-  fmcheck get-etree-summary <filter>... [-d] [--topology=FILE]
-  fmcheck get-sr-summary-all [-d] [--topology=FILE]
-  fmcheck get-sr-summary <source> <destination> [-d] [--topology=FILE]
-  fmcheck get-node-summary [-d] [--topology=FILE]
+  fmcheck get-flow-stats-all [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-flow-stats <filter>... [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-flow-node-stats-all <node> [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-flow-node-stats <node> <filter>... [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-group-stats-all [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-group-stats <filter>... [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-group-node-stats-all <node> [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-group-node-stats <node> <filter>... [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-eline-stats-all [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-eline-stats <filter>... [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-eline-summary-all [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-eline-summary <filter>... [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-etree-stats-all [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-etree-stats <filter>... [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-etree-summary-all [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-etree-summary <filter>... [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-sr-summary-all [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-sr-summary <source> <destination> [-d] [--format=FORMAT] [--topology=FILE]
+  fmcheck get-node-summary [-d] [--format=FORMAT] [--topology=FILE]
   fmcheck (-h | --help)
 
 Options:
@@ -55,6 +58,9 @@ Options:
   -s --stopped      If Mininet is not running.
   -r --segementrouting  Use segment routing topology.
   -a --check-stats  Check flow/groups states with previous check
+  -i --interval=SECONDS  Seconds between watch checks [default: 60].
+  -l --listen=ADDRESS  [host:]port or unix:<path> to serve on [default: localhost:8700].
+  -f --format=FORMAT  Output format, text or jsonl [default: text].
   -d --debug  Log debug level
   --version     Show version.
 
@@ -62,28 +68,68 @@ Options:
 from __future__ import print_function
 import os
 import sys
-import yaml
+import time
+import shlex
 import logging
-import coloredlogs
-from flowmanager.topology import Topology
-import flowmanager.openflow
-from docopt.docopt import docopt
-
+from flowmanager.watch import CHECKS
+from docopt.docopt import docopt, parse_argv, parse_defaults, Option, Tokens
+
+# commands changing the network state, cached responses are dropped after them
+DESTRUCTIVE_COMMANDS = [
+    'reboot-random-controller', 'reboot-controller', 'reboot-controller-all',
+    'reboot-controller-by-switch', 'reboot-controller-by-random-switch',
+    'reboot-random-switch', 'reboot-switch', 'reboot-controller-vm',
+    'reboot-random-controller-vm', 'break-random-gw-switch', 'break-gw-switch',
+    'break-random-ctrl-switch', 'break-ctrl-switch', 'isolate-random-ctrl',
+    'isolate-ctrl', 'isolate-random-ctrl-switch', 'isolate-ctrl-switch',
+    'delete-random-groups', 'delete-groups', 'delete-random-flows',
+    'delete-flows'
+]
+
+# commands running other commands, they cannot be used in a batch
+BATCH_EXCLUDED = ['batch', 'watch', 'serve']
+
+# options set for the whole batch, a batch line giving them another value
+# than the batch is rejected
+BATCH_OPTIONS = ['--controller', '--debug', '--format', '--topology']
+
+# destructive commands on a single switch, by the argument naming it
+SWITCH_COMMANDS = {
+    'reboot-switch': '<name>', 'break-gw-switch': '<name>',
+    'delete-groups': '<name>', 'delete-flows': '<name>',
+    'break-ctrl-switch': '<switch_name>', 'isolate-ctrl-switch': '<switch_name>'
+}
 
 class Shell(object):
 
     def __init__(self):
         arguments = docopt(__doc__, version='Flow Manager Testing Tools 1.1')
 
+        # heavy modules are imported once the arguments are valid, so help
+        # and usage errors return right away
+        from flowmanager.topology import Topology
+
         # Reduce urllib3 logging messages
         logging.getLogger("urllib3").setLevel(logging.WARNING)
 
+        if arguments['--format'] != 'text':
+            import flowmanager.output as output
+            try:
+                output.set_format(arguments['--format'])
+            except ValueError, msg:
+                sys.exit(msg)
+            # messages are written to stdout as JSON lines instead
+            logging.getLogger().addHandler(output.JsonLinesHandler())
+            logging.getLogger().setLevel(
+                logging.DEBUG if arguments['--debug'] else logging.INFO)
         # Colored logging
-        if arguments['--debug']:
+        elif arguments['--debug']:
+            import coloredlogs
             logging.getLogger().setLevel(logging.DEBUG)
             coloredlogs.install(level='DEBUG')
             # print(arguments)
         else:
+            import coloredlogs
             logging.getLogger().setLevel(logging.INFO)
             coloredlogs.install(level='INFO')
 
@@ -103,8 +149,8 @@ class Shell(object):
 
         props = None
         if (os.path.isfile(file)):
-            with open(file, 'r') as f:
-                props = yaml.load(f)
+            from flowmanager.topofile import load_topology_file
+            props = load_topology_file(file)
 
         if props is None:
             logging.error("yml topology file %s not loaded", file)
@@ -120,223 +166,345 @@ class Shell(object):
                      })
                 i = i + 1
 
-        result = None
         topology = Topology(props)
-        if arguments['links']:
-            should_be_up = True if not arguments['--stopped'] else False
-            include_sr = True if arguments['--segementrouting'] else False
-            result = topology.validate_links(
-                should_be_up=should_be_up, include_sr=include_sr)
-
-        elif arguments['nodes']:
-            should_be_up = True if not arguments['--stopped'] else False
-            include_sr = True if arguments['--segementrouting'] else False
-            result = topology.validate_nodes(
-                should_be_up=should_be_up, include_sr=include_sr)
-
-        elif arguments['roles']:
-            result = topology.validate_nodes_roles()
-
-        elif arguments['flows']:
-            result = topology.validate_openflow_elements(
-                check_stats=True if arguments['--check-stats'] else False)
-
-        elif arguments['sync-status']:
-            result = topology.validate_cluster()
-        # Reboot Commands
-        elif arguments['reboot-random-controller']:
-            ctrl = topology.get_random_controller()
-            if not ctrl:
-                result = False
-                logging.error("controller not found")
-            else:
-                result = topology.get_random_controller().reboot()
-
-        elif arguments['reboot-controller']:
-            ctrl = topology.get_controller(arguments['<name>'])
-            if not ctrl:
-                result = False
-                logging.error("controller %s not found", arguments['<name>'])
+        if arguments['watch']:
+            checks = arguments['<check>'] or CHECKS
+            unknown = [check for check in checks if check not in CHECKS]
+            if unknown:
+                logging.error("unknown checks %s, supported checks are %s",
+                              ', '.join(unknown), ', '.join(CHECKS))
+                sys.exit(1)
+            from flowmanager.watch import Watcher
+            result = Watcher(topology, checks, lambda check: execute(
+                topology, _get_command_arguments(arguments, check)),
+                interval=float(arguments['--interval'])).run()
+        elif arguments['batch']:
+            if arguments['<file>']:
+                with open(arguments['<file>'], 'r') as f:
+                    result = run_batch(topology, f.readlines(), arguments)
             else:
-                result = topology.get_controller(arguments['<name>']).reboot()
+                result = run_batch(topology, sys.stdin.readlines(), arguments)
+        elif arguments['serve']:
+            from flowmanager.server import get_server
+            server = get_server(arguments['--listen'], topology, execute, arguments)
+            logging.info("serving validations and stats on %s", arguments['--listen'])
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                logging.info("server stopped")
+            finally:
+                server.server_close()
+            result = True
+        else:
+            result = execute(topology, arguments)
 
-        elif arguments['reboot-controller-all']:
-            ctrl = topology.get_all_controllers()
-            if not ctrl:
-                result = False
-                logging.error("controller %s not found", arguments['<name>'])
-            else:
-                result = [controller.reboot() for controller in ctrl]
-                if result:
-                    logging.info(
-                        '%d controllers have been successfully rebooted', len(ctrl))
-
-        elif arguments['reboot-controller-by-switch']:
-            result = topology.get_node_cluster_owner(
-                arguments['<name>']).reboot()
-
-        elif arguments['reboot-controller-by-random-switch']:
-            result = topology.get_node_cluster_owner(
-                topology.get_random_switch().openflow_name).reboot()
-
-        elif arguments['reboot-random-switch']:
-            switch = topology.get_random_switch()
-            if switch:
-                result = switch.reboot()
-            else:
-                logging.error("random switch not found")
+        topology.close()
 
-        elif arguments['reboot-switch']:
-            switch = topology.get_switch(arguments['<name>'])
-            if switch:
-                result = switch.reboot()
-            else:
-                logging.error("switch %s not found", arguments['<name>'])
+        if not result:
+            sys.exit(1)
 
-        elif arguments['reboot-controller-vm']:
-            ctrl = topology.get_controller(arguments['<name>'])
-            if not ctrl:
-                result = False
-                logging.error("controller %s not found", arguments['<name>'])
-            else:
-                result = topology.get_controller(
-                    arguments['<name>']).reboot_vm()
-
-        elif arguments['reboot-random-controller-vm']:
-            ctrl = topology.get_random_controller()
-            if not ctrl:
-                result = False
-                logging.error("controller not found")
-            else:
-                result = topology.get_random_controller().reboot_vm()
 
-        # Break Commands
-        elif arguments['break-gw-switch']:
-            result = topology.get_switch(arguments['<name>']).break_gateway(
-                seconds=arguments['<seconds>'])
+def execute(topology, arguments):
+    """Runs the command of the docopt arguments, returns its result"""
+    result = None
+    if arguments['links']:
+        should_be_up = True if not arguments['--stopped'] else False
+        include_sr = True if arguments['--segementrouting'] else False
+        result = topology.validate_links(
+            should_be_up=should_be_up, include_sr=include_sr)
+
+    elif arguments['nodes']:
+        should_be_up = True if not arguments['--stopped'] else False
+        include_sr = True if arguments['--segementrouting'] else False
+        result = topology.validate_nodes(
+            should_be_up=should_be_up, include_sr=include_sr)
+
+    elif arguments['roles']:
+        result = topology.validate_nodes_roles()
+
+    elif arguments['flows']:
+        result = topology.validate_openflow_elements(
+            check_stats=True if arguments['--check-stats'] else False)
+
+    elif arguments['sync-status']:
+        result = topology.validate_cluster()
+    # Reboot Commands
+    elif arguments['reboot-random-controller']:
+        ctrl = topology.get_random_controller()
+        if not ctrl:
+            result = False
+            logging.error("controller not found")
+        else:
+            result = topology.get_random_controller().reboot()
 
-        elif arguments['break-random-gw-switch']:
-            result = topology.get_random_switch().break_gateway(
-                seconds=arguments['<seconds>'])
+    elif arguments['reboot-controller']:
+        ctrl = topology.get_controller(arguments['<name>'])
+        if not ctrl:
+            result = False
+            logging.error("controller %s not found", arguments['<name>'])
+        else:
+            result = topology.get_controller(arguments['<name>']).reboot()
 
-        elif arguments['break-ctrl-switch']:
-            result = topology.get_switch(arguments['<switch_name>']).break_controller_switch(
-                controller_name=arguments['<controller_name>'], seconds=arguments['<seconds>'])
+    elif arguments['reboot-controller-all']:
+        ctrl = topology.get_all_controllers()
+        if not ctrl:
+            result = False
+            logging.error("controller %s not found", arguments['<name>'])
+        else:
+            result = [controller.reboot() for controller in ctrl]
+            if result:
+                logging.info(
+                    '%d controllers have been successfully rebooted', len(ctrl))
+
+    elif arguments['reboot-controller-by-switch']:
+        result = topology.get_node_cluster_owner(
+            arguments['<name>']).reboot()
+
+    elif arguments['reboot-controller-by-random-switch']:
+        result = topology.get_node_cluster_owner(
+            topology.get_random_switch().openflow_name).reboot()
+
+    elif arguments['reboot-random-switch']:
+        switch = topology.get_random_switch()
+        if switch:
+            result = switch.reboot()
+        else:
+            logging.error("random switch not found")
 
-        elif arguments['break-random-ctrl-switch']:
-            result = topology.get_random_switch().break_controller_switch(
-                controller_name=arguments['<controller_name>'], seconds=arguments['<seconds>'])
+    elif arguments['reboot-switch']:
+        switch = topology.get_switch(arguments['<name>'])
+        if switch:
+            result = switch.reboot()
+        else:
+            logging.error("switch %s not found", arguments['<name>'])
 
-        # Isolate Commands
-        elif arguments['isolate-ctrl']:
+    elif arguments['reboot-controller-vm']:
+        ctrl = topology.get_controller(arguments['<name>'])
+        if not ctrl:
+            result = False
+            logging.error("controller %s not found", arguments['<name>'])
+        else:
             result = topology.get_controller(
-                arguments['<controller_name>']).isolate(seconds=arguments['<seconds>'])
-
-        elif arguments['isolate-random-ctrl']:
-            result = topology.get_random_controller().isolate(
-                seconds=arguments['<seconds>'])
-
-        elif arguments['isolate-ctrl-switch']:
-            result = topology.get_node_cluster_owner(
-                arguments['<switch_name>']).isolate(seconds=arguments['<seconds>'])
-
-        elif arguments['isolate-random-ctrl-switch']:
-            result = topology.get_node_cluster_owner(
-                topology.get_random_switch_name()).isolate(seconds=arguments['<seconds>'])
-
-        # Delete commands
-        elif arguments['delete-random-groups']:
-            switch = topology.get_random_switch()
-            if switch:
-                result = switch.delete_groups()
-            else:
-                logging.error("random switch not found")
+                arguments['<name>']).reboot_vm()
 
-        elif arguments['delete-groups']:
-            switch = topology.get_switch(arguments['<name>'])
-            if switch:
-                result = switch.delete_groups()
-            else:
-                logging.error("switch %s not found", arguments['<name>'])
-
-        elif arguments['delete-random-flows']:
-            result = topology.get_random_switch().delete_flows()
-
-        elif arguments['delete-flows']:
-            result = topology.get_switch(arguments['<name>']).delete_flows()
-
-        # Get flow stats
-        elif arguments['get-flow-stats-all']:
-            result = topology.get_random_controller().get_flow_stats()
-
-        elif arguments['get-flow-stats']:
-            result = topology.get_random_controller().get_flow_stats(
-                filters=arguments['<filter>'])
-
-        elif arguments['get-flow-node-stats-all']:
-            result = topology.get_node_cluster_owner(
-                arguments['<node>']).get_flow_stats(node_name=arguments['<node>'])
-
-        elif arguments['get-flow-node-stats']:
-            result = topology.get_node_cluster_owner(
-                arguments['<node>']).get_flow_stats(node_name=arguments['<node>'], filters=arguments['<filter>'])
-
-        # Get group stats
-        elif arguments['get-group-stats-all']:
-            result = topology.get_random_controller().get_group_stats()
-
-        elif arguments['get-group-stats']:
-            result = topology.get_random_controller().get_group_stats(
-                filters=arguments['<filter>'])
-
-        elif arguments['get-group-node-stats-all']:
-            result = topology.get_node_cluster_owner(
-                openflow_name=arguments['<node>']).get_group_stats(node_name=arguments['<node>'])
-
-        elif arguments['get-group-node-stats']:
-            result = topology.get_node_cluster_owner(
-                openflow_name=arguments['<node>']).get_group_stats(filters=arguments['<filter>'], node_name=arguments['<node>'])
-
-        # Get Eline stats
-        elif arguments['get-eline-stats-all']:
-            result = topology.get_random_controller().get_eline_stats()
-        elif arguments['get-eline-stats']:
-            result = topology.get_random_controller().get_eline_stats(
-                filters=arguments['<filter>'])
-        elif arguments['get-eline-summary-all']:
-            result = topology.get_random_controller().get_eline_summary()
-        elif arguments['get-eline-summary']:
-            result = topology.get_random_controller().get_eline_summary(
-                filters=arguments['<filter>'])
-
-        # Get Etree stats
-        elif arguments['get-etree-stats-all']:
-            result = flowmanager.openflow.get_etrees(
-                topology.get_random_controller())
-            # result = topology.get_random_controller().get_etree_stats()
-        elif arguments['get-etree-stats']:
-            result = topology.get_random_controller().get_etree_stats(
-                filters=arguments['<filter>'])
-        elif arguments['get-etree-summary-all']:
-            result = topology.get_random_controller().get_etree_summary()
-        elif arguments['get-etree-summary']:
-            result = topology.get_random_controller().get_etree_summary(
-                filters=arguments['<filter>'])
-
-        # Get Segment Routing info
-        elif arguments['get-sr-summary-all']:
-            result = topology.get_random_controller().get_sr_summary_all(
-                topology.switches_by_openflow_name)
-        elif arguments['get-sr-summary']:
-            result = topology.get_random_controller().get_sr_summary(
-                source=arguments['<source>'], destination=arguments['<destination>'])
-        # Get Node Summary
-        elif arguments['get-node-summary']:
-            result = topology.get_random_controller().get_node_summary(
-                topology.switches_by_openflow_name)
+    elif arguments['reboot-random-controller-vm']:
+        ctrl = topology.get_random_controller()
+        if not ctrl:
+            result = False
+            logging.error("controller not found")
+        else:
+            result = topology.get_random_controller().reboot_vm()
+
+    # Break Commands
+    elif arguments['break-gw-switch']:
+        result = topology.get_switch(arguments['<name>']).break_gateway(
+            seconds=arguments['<seconds>'])
+
+    elif arguments['break-random-gw-switch']:
+        result = topology.get_random_switch().break_gateway(
+            seconds=arguments['<seconds>'])
+
+    elif arguments['break-ctrl-switch']:
+        result = topology.get_switch(arguments['<switch_name>']).break_controller_switch(
+            controller_name=arguments['<controller_name>'], seconds=arguments['<seconds>'])
+
+    elif arguments['break-random-ctrl-switch']:
+        result = topology.get_random_switch().break_controller_switch(
+            controller_name=arguments['<controller_name>'], seconds=arguments['<seconds>'])
+
+    # Isolate Commands
+    elif arguments['isolate-ctrl']:
+        result = topology.get_controller(
+            arguments['<controller_name>']).isolate(seconds=arguments['<seconds>'])
+
+    elif arguments['isolate-random-ctrl']:
+        result = topology.get_random_controller().isolate(
+            seconds=arguments['<seconds>'])
+
+    elif arguments['isolate-ctrl-switch']:
+        result = topology.get_node_cluster_owner(
+            arguments['<switch_name>']).isolate(seconds=arguments['<seconds>'])
+
+    elif arguments['isolate-random-ctrl-switch']:
+        result = topology.get_node_cluster_owner(
+            topology.get_random_switch_name()).isolate(seconds=arguments['<seconds>'])
+
+    # Delete commands
+    elif arguments['delete-random-groups']:
+        switch = topology.get_random_switch()
+        if switch:
+            result = switch.delete_groups()
+        else:
+            logging.error("random switch not found")
 
-        if not result:
-            sys.exit(1)
+    elif arguments['delete-groups']:
+        switch = topology.get_switch(arguments['<name>'])
+        if switch:
+            result = switch.delete_groups()
+        else:
+            logging.error("switch %s not found", arguments['<name>'])
+
+    elif arguments['delete-random-flows']:
+        result = topology.get_random_switch().delete_flows()
+
+    elif arguments['delete-flows']:
+        result = topology.get_switch(arguments['<name>']).delete_flows()
+
+    # Get flow stats
+    elif arguments['get-flow-stats-all']:
+        result = topology.get_random_controller().get_flow_stats()
+
+    elif arguments['get-flow-stats']:
+        result = topology.get_random_controller().get_flow_stats(
+            filters=arguments['<filter>'])
+
+    elif arguments['get-flow-node-stats-all']:
+        result = topology.get_node_cluster_owner(
+            arguments['<node>']).get_flow_stats(node_name=arguments['<node>'])
+
+    elif arguments['get-flow-node-stats']:
+        result = topology.get_node_cluster_owner(
+            arguments['<node>']).get_flow_stats(node_name=arguments['<node>'], filters=arguments['<filter>'])
+
+    # Get group stats
+    elif arguments['get-group-stats-all']:
+        result = topology.get_random_controller().get_group_stats()
+
+    elif arguments['get-group-stats']:
+        result = topology.get_random_controller().get_group_stats(
+            filters=arguments['<filter>'])
+
+    elif arguments['get-group-node-stats-all']:
+        result = topology.get_node_cluster_owner(
+            openflow_name=arguments['<node>']).get_group_stats(node_name=arguments['<node>'])
+
+    elif arguments['get-group-node-stats']:
+        result = topology.get_node_cluster_owner(
+            openflow_name=arguments['<node>']).get_group_stats(filters=arguments['<filter>'], node_name=arguments['<node>'])
+
+    # Get Eline stats
+    elif arguments['get-eline-stats-all']:
+        result = topology.get_random_controller().get_eline_stats()
+    elif arguments['get-eline-stats']:
+        result = topology.get_random_controller().get_eline_stats(
+            filters=arguments['<filter>'])
+    elif arguments['get-eline-summary-all']:
+        result = topology.get_random_controller().get_eline_summary()
+    elif arguments['get-eline-summary']:
+        result = topology.get_random_controller().get_eline_summary(
+            filters=arguments['<filter>'])
+
+    # Get Etree stats
+    elif arguments['get-etree-stats-all']:
+        result = topology.get_random_controller().get_etree_stats()
+    elif arguments['get-etree-stats']:
+        result = topology.get_random_controller().get_etree_stats(
+            filters=arguments['<filter>'])
+    elif arguments['get-etree-summary-all']:
+        result = topology.get_random_controller().get_etree_summary()
+    elif arguments['get-etree-summary']:
+        result = topology.get_random_controller().get_etree_summary(
+            filters=arguments['<filter>'])
+
+    # Get Segment Routing info
+    elif arguments['get-sr-summary-all']:
+        result = topology.get_random_controller().get_sr_summary_all(
+            topology.switches_by_openflow_name)
+    elif arguments['get-sr-summary']:
+        result = topology.get_random_controller().get_sr_summary(
+            source=arguments['<source>'], destination=arguments['<destination>'])
+    # Get Node Summary
+    elif arguments['get-node-summary']:
+        result = topology.get_random_controller().get_node_summary(
+            topology.switches_by_openflow_name)
+
+    commands = [command for command in DESTRUCTIVE_COMMANDS if arguments.get(command)]
+    if commands:
+        # the snapshot file outlives the process, the next incremental check
+        # of any run must dump and check the switches changed again
+        switch = SWITCH_COMMANDS.get(commands[0])
+        topology.invalidate_snapshot(arguments[switch] if switch else None)
+
+    return result
+
+
+def run_batch(topology, lines, batch_arguments):
+    """Runs a fmcheck command per line against one topology.
+
+    Lines have the syntax of the command line, with or without the fmcheck
+    prefix, and may be blank, comments or 'sleep <seconds>'. The format,
+    debug, topology and controller options of batch_arguments are used for
+    every command, lines giving them other values fail.
+    Returns True if all the commands succeed.
+    """
+    results = []
+    for number, line in enumerate(lines, 1):
+        argv = shlex.split(line, comments=True)
+        if argv and os.path.basename(argv[0]) in ('fmcheck', 'fmcheck2'):
+            argv = argv[1:]
+        if not argv:
+            continue
+        if argv[0] == 'sleep' and len(argv) == 2:
+            time.sleep(float(argv[1]))
+            continue
+
+        start = time.time()
+        try:
+            if argv[0] in BATCH_EXCLUDED:
+                raise SystemExit()
+            arguments = docopt(__doc__, argv=argv)
+        except SystemExit:
+            logging.error("BATCH: line %d, invalid command %s",
+                          number, ' '.join(argv))
+            results.append(False)
+            continue
+        options = _get_batch_conflicts(argv, arguments, batch_arguments)
+        if options:
+            logging.error("BATCH: line %d, %s cannot be set per command, set them for the batch",
+                          number, ', '.join(options))
+            results.append(False)
+            continue
+
+        if argv[0] in CHECKS:
+            # validations load their state again, responses stay cached
+            topology.reset(invalidate_cache=False)
+        try:
+            result = execute(topology, arguments)
+        except Exception, msg:
+            logging.error("BATCH: line %d, %s raised %s", number, argv[0], msg)
+            result = False
+        if argv[0] in DESTRUCTIVE_COMMANDS:
+            # the next commands must not read the responses cached before
+            import flowmanager.openflow as openflow
+            openflow.invalidate_cache()
+        results.append(bool(result))
+        logging.info("BATCH: %s %s in %.2f seconds (exit status %d)", ' '.join(argv),
+                     'succeeded' if result else 'failed', time.time() - start,
+                     0 if result else 1)
+
+    logging.info("BATCH: %d of %d commands succeeded",
+                 results.count(True), len(results))
+    return all(results)
+
+
+def _get_batch_conflicts(argv, arguments, batch_arguments):
+    """Returns the batch options given in argv with other values than in
+    batch_arguments, the other ones are set to the batch values"""
+    given = set(option.name for option in parse_argv(Tokens(argv), parse_defaults(__doc__))
+                if isinstance(option, Option))
+    conflicts = []
+    for name in BATCH_OPTIONS:
+        if name in given and arguments[name] != batch_arguments[name]:
+            conflicts.append(name)
+        arguments[name] = batch_arguments[name]
+    return conflicts
+
+
+def _get_command_arguments(arguments, command):
+    """Returns the arguments to run another command with the same options"""
+    arguments = dict(arguments)
+    arguments[command] = True
+    return arguments
 
 
 def main():
@@ -3,11 +3,20 @@ This module contains the primitives and methods for groups.
 
 """
 
-import logging
-
 
 class Group(object):
 
+    """Group found in the controller datastores, the switch or flow manager.
+
+    Sources are recorded as presence flags, the raw groups are only kept
+    when keep_raw is set to report them with the errors.
+    """
+
+    __slots__ = ('node', 'node_of_name', 'groupid', 'of_config', 'of_operational',
+                 'switch', 'fm', 'calculated', 'raw')
+
+    keep_raw = False
+
     def __init__(self, node, node_of_name, groupid):
         self.node = node
         self.node_of_name = node_of_name
@@ -17,51 +26,32 @@ class Group(object):
         self.switch = None
         self.fm = None
         self.calculated = False
+        self.raw = None
+
+    def _keep_raw(self, source, group):
+        if self.keep_raw:
+            if self.raw is None:
+                self.raw = {}
+            self.raw[source] = group
 
     def add_of_config(self, group):
-        self.of_config = group
+        self.of_config = True
+        self._keep_raw('config', group)
 
     def add_of_operational(self, group):
-        self.of_operational = group
+        self.of_operational = True
+        self._keep_raw('operational', group)
 
     def add_switch(self, group):
-        self.switch = group
+        self.switch = True
+        self._keep_raw('switch', group)
 
     def add_fm(self, group):
-        self.fm = group
+        self.fm = True
+        self._keep_raw('monitored', group)
 
     def mark_as_calculated(self):
         self.calculated = True
 
-    def check(self):
-        if self.of_config and not self.switch:
-            logging.error("%s(%s) group %s is not runnig in the switch. %s",
-                          self.node, self.node_of_name, self.groupid, self._get_info_msg())
-        elif self.of_config and not self.of_operational:
-            logging.error("%s(%s) group %s not found in operational datastore. %s",
-                          self.node, self.node_of_name, self.groupid, self._get_info_msg())
-        elif self.of_config and not self.fm:
-            logging.error("%s(%s) group %s is not being monitored. %s",
-                          self.node, self.node_of_name, self.groupid, self._get_info_msg())
-        elif self.of_config and not self.calculated:
-            logging.error("%s(%s) group %s not found in calculated groups. %s",
-                          self.node, self.node_of_name, self.groupid, self._get_info_msg())
-        elif not self.of_config and self.switch:
-            logging.error("%s(%s) group %s runnig in switch but not configured. %s",
-                          self.node, self.node_of_name, self.groupid, self._get_info_msg())
-        elif not self.of_config and self.of_operational:
-            logging.error("%s(%s) group %s found operational datastore but not in configuration. %s",
-                          self.node, self.node_of_name, self.groupid, self._get_info_msg())
-        elif not self.of_config and not self.of_operational and not self.switch and self.fm:
-            logging.error("%s(%s) group %s monitored but not running neither configured. %s",
-                          self.node, self.node_of_name, self.groupid, self._get_info_msg())
-        elif not self.of_config and self.calculated:
-            logging.error("%s(%s) group %s calculated but not configured. %s",
-                          self.node, self.node_of_name, self.groupid, self._get_info_msg())
-        else:
-            logging.debug("GROUP: OK: %s %s", self.groupid,
-                          self._get_info_msg())
-            return True
-
     def _get_info_msg(self):
         return "{}({}) of config ({}), of operational ({}), switch ({}), monitored ({}), calculated ({})".format(self.node, self.node_of_name, self.of_config != None, self.of_operational != None, self.switch != None, self.fm != None, self.calculated)
@@ -22,6 +22,13 @@ class Link(object):
         self.sr_dst = None
         self.sr = {}
 
+    def reset(self):
+        """Forgets the destinations found in the controller"""
+        self.of_dst = None
+        self.of = {}
+        self.sr_dst = None
+        self.sr = {}
+
     def add_sr_dst(self, link):
         logging.debug('LINK: adding segment routing link from %s to %s, expected destination %s',
                       self.name, link, self.expected_dst_name)
@@ -1,7 +1,97 @@
 import re
 import logging
+import pexpect
 from flowmanager.switch import Switch
 from flowmanager.ssh import NoviflowSSH
+from flowmanager.flow import has_prefix
+
+# fields of each output in the order they are tried on a line, with a
+# keyword any line having the field contains once lowercased, so most lines
+# are skipped without running a pattern; like the CLI parsers before them
+# the patterns match anywhere in a line
+TABLE, FLOW_ID, COOKIE, FLOW_PACKETS, FLOW_BYTES = range(5)
+FLOW_FIELDS = [
+    (TABLE, '[table', re.compile(r'\[TABLE\s+(\d+)\]', re.IGNORECASE)),
+    (FLOW_ID, '[flow_id', re.compile(r'\[FLOW_ID\s*(\d+)\]', re.IGNORECASE)),
+    (COOKIE, 'cookie', re.compile(r'Cookie\s*=\s*(\S+)', re.IGNORECASE)),
+    (FLOW_PACKETS, 'packet_count', re.compile(
+        r'Packet_count\s*=\s*(\d+)', re.IGNORECASE)),
+    (FLOW_BYTES, 'byte_count', re.compile(
+        r'Byte_count\s*=\s*(\d+)', re.IGNORECASE))]
+
+GROUP_ID, GROUP_PACKETS, GROUP_BYTES = range(3)
+GROUP_FIELDS = [
+    (GROUP_ID, 'group id:', re.compile(r'Group id:\s*(\d+)', re.IGNORECASE)),
+    (GROUP_PACKETS, 'packet count:', re.compile(
+        r'Reference count:\s*\d+\s*\S\s+Packet count:\s*(\d+)', re.IGNORECASE)),
+    (GROUP_BYTES, 'byte count:', re.compile(
+        r'Byte count:\s*(\d+)', re.IGNORECASE))]
+
+
+def _get_field(line, fields):
+    """Returns the kind and value of the first field found in a line"""
+    lowered = line.lower()
+    for kind, keyword, pattern in fields:
+        if keyword in lowered:
+            match = pattern.search(line)
+            if match:
+                return kind, match.group(1)
+    return None, None
+
+
+def parse_flows(lines, prefix=None):
+    """Returns the flows of the lines of 'show status flow tableid all'.
+
+    Lines can be any iterable, e.g. the lines of a command still running.
+    Flows whose cookie does not have the prefix are dropped.
+    """
+    flows = []
+    current_flow = None
+    current_table = None
+    for line in lines:
+        kind, value = _get_field(line, FLOW_FIELDS)
+        if kind is None:
+            continue
+        if kind == FLOW_ID:
+            current_flow = {'id': value, 'table': current_table}
+            flows.append(current_flow)
+        elif kind == TABLE:
+            current_table = value
+            current_flow = None
+        elif current_flow is None:
+            continue
+        elif kind == COOKIE:
+            current_flow['cookie'] = int(value, 16)
+            # the CLI cannot filter by cookie, drop other flows here
+            if not has_prefix(current_flow['cookie'], prefix):
+                flows.pop()
+                current_flow = None
+        elif kind == FLOW_PACKETS:
+            current_flow['packets'] = value
+        else:
+            current_flow['bytes'] = value
+    return flows
+
+
+def parse_groups(lines):
+    """Returns the groups of the lines of 'show stats group groupid all'"""
+    groups = []
+    current_group = None
+    for line in lines:
+        kind, value = _get_field(line, GROUP_FIELDS)
+        if kind is None:
+            continue
+        if kind == GROUP_ID:
+            current_group = {'id': value}
+            groups.append(current_group)
+            continue
+        elif current_group is None:
+            continue
+        current_group['packets' if kind ==
+                      GROUP_PACKETS else 'bytes'] = value
+        if 'packets' in current_group and 'bytes' in current_group:
+            current_group = None
+    return groups
 
 
 class Noviflow(Switch):
@@ -17,13 +107,20 @@ class Noviflow(Switch):
         self.type = 'noviflow'
         self.ssh = NoviflowSSH(ip=self.ip, user=self.user,
                                port=self.port, password=self.password)
+        # parse the flows while the CLI output is still being read
+        self.stream_output = bool(props.get('stream_output'))
 
     def reboot(self):
         if self.ssh.execute_command('set status switch reboot', prompt="[all/noentries/nopipeline/none]"):
             if self.ssh.execute_command('noentries', prompt="(y/n)"):
                 self.ssh.execute_command('y', prompt=None, eof=True)
+                self.ssh.close()
                 return True
 
+    def close(self):
+        if self.ssh.is_session_open():
+            self.ssh.close()
+
     def break_gateway(self, seconds=0):
         raise Exception(
             'break method is not implemented by this switch {}'.format(self.name))
@@ -66,113 +163,42 @@ class Noviflow(Switch):
 
     def delete_groups(self):
         if self.ssh.execute_command('del config group groupid all'):
-            self.ssh.close()
             return True
 
     def delete_flows(self):
         if self.ssh.execute_command('del config flow tableid all'):
-            self.ssh.close()
             return True
 
-    def get_flows(self):
+    def get_flows(self, prefix=None):
         logging.debug("NOVIFLOW: %s(%s) getting flows",
                       self.name, self.openflow_name)
 
-        text_flows = self.ssh.execute_command('show status flow tableid all')
+        command = 'show status flow tableid all'
+        if self.stream_output:
+            lines = self.ssh.execute_command_lines(command)
+            if lines is None:
+                return None
+            try:
+                return parse_flows(lines, prefix)
+            except pexpect.TIMEOUT:
+                logging.error("NOVIFLOW: %s(%s) timeout reading flows",
+                              self.name, self.openflow_name)
+                return None
+
+        text_flows = self.ssh.execute_command(command)
         if not text_flows:
             return None
-
-        tableid = re.compile(r'\[TABLE\s+(\d+)\]', re.IGNORECASE)
-        flowid = re.compile(r'\[FLOW_ID\s*(\d+)\]', re.IGNORECASE)
-        cookies = re.compile(r'Cookie\s*=\s*(\S+)', re.IGNORECASE)
-        packetCounts = re.compile(r'Packet_count\s*=\s*(\d+)', re.IGNORECASE)
-        byteCounts = re.compile(r'Byte_count\s*=\s*(\d+)', re.IGNORECASE)
-
-        flows = []
-        current_flow = None
-        current_table = None
-        for line in text_flows.splitlines():
-            logging.debug("NOVIFLOW: %s(%s) processing line %s",
-                          self.name, self.openflow_name, line)
-            match = tableid.findall(line)
-            if match:
-                logging.debug("NOVIFLOW: %s(%s) updating table %s",
-                              self.name, self.openflow_name, match[0])
-                current_table = match[0]
-                current_flow = None
-                continue
-
-            match = flowid.findall(line)
-            if match:
-                logging.debug("NOVIFLOW: %s(%s) creating flow %s",
-                              self.name, self.openflow_name, match[0])
-                current_flow = {'id': match[0], 'table': current_table}
-                flows.append(current_flow)
-                continue
-
-            if current_flow is None:
-                continue
-
-            match = cookies.findall(line)
-            if match:
-                current_flow['cookie'] = int('0x{}'.format(match[0]), 16)
-                continue
-
-            match = packetCounts.findall(line)
-            if match:
-                current_flow['packets'] = match[0]
-                continue
-
-            match = byteCounts.findall(line)
-            if match:
-                current_flow['bytes'] = match[0]
-                continue
-
-        self.ssh.close()
-        # logging.info(flows)
-        return flows
+        return parse_flows(text_flows.splitlines(), prefix)
 
     def get_groups(self):
         text_groups = self.ssh.execute_command('show stats group groupid all')
         if not text_groups:
             return None
-
-        groupIdRegex = re.compile(r'Group id:\s*(\d+)', re.IGNORECASE)
-        packetCountRegex = re.compile(
-            r'Reference count:\s*\d+\s*\S\s+Packet count:\s*(\d+)', re.IGNORECASE)
-        byteCountRegex = re.compile(r'Byte count:\s*(\d+)', re.IGNORECASE)
-
-        groups = []
-        current_group = None
-        for line in text_groups.splitlines():
-            match = groupIdRegex.findall(line)
-            if match:
-                current_group = {'id': match[0]}
-                groups.append(current_group)
-                continue
-            elif current_group is None:
-                continue
-
-            match = packetCountRegex.findall(line)
-            if match:
-                current_group['packets'] = match[0]
-                if 'bytes' in current_group:
-                    current_group = None
-                continue
-
-            match = byteCountRegex.findall(line)
-            if match:
-                current_group['bytes'] = match[0]
-                if 'packets' in current_group:
-                    current_group = None
-                continue
-
-        self.ssh.close()
-        return groups
+        return parse_groups(text_groups.splitlines())
 
     def get_controllers_role(self):
         ssh = self.ssh
-        if not ssh.create_session():
+        if not ssh.is_session_open() and not ssh.create_session():
             return None
         text_groups = self.ssh.execute_command('show status ofchannel')
         if not text_groups:
@@ -0,0 +1,189 @@
+"""OpenFlow Client
+
+This module implements a minimal OpenFlow 1.3 client to read flow and group
+statistics straight from a switch, e.g. through the OVS bridge management
+socket, instead of parsing the text output of ovs-ofctl.
+
+"""
+import logging
+import socket
+import struct
+
+OFP_VERSION = 0x04
+OFP_HEADER = struct.Struct('!BBHI')
+
+OFPT_HELLO = 0
+OFPT_ERROR = 1
+OFPT_ECHO_REQUEST = 2
+OFPT_ECHO_REPLY = 3
+OFPT_MULTIPART_REQUEST = 18
+OFPT_MULTIPART_REPLY = 19
+
+OFPMP_FLOW = 1
+OFPMP_GROUP = 6
+OFPMPF_REPLY_MORE = 1
+
+OFPTT_ALL = 0xff
+OFPP_ANY = 0xffffffff
+OFPG_ANY = 0xffffffff
+OFPG_ALL = 0xfffffffc
+
+MULTIPART_HEADER = struct.Struct('!HH4x')
+FLOW_STATS_REQUEST = struct.Struct('!B3xII4xQQ')
+# empty OXM match padded to 8 bytes
+EMPTY_MATCH = struct.pack('!HH4x', 1, 4)
+FLOW_STATS = struct.Struct('!HBxIIHHHH4xQQQ')
+GROUP_STATS_REQUEST = struct.Struct('!I4x')
+GROUP_STATS = struct.Struct('!H2xII4xQQII')
+
+
+class OpenFlowError(Exception):
+    pass
+
+
+def get_address(address, bridge):
+    """Returns the socket address of an openflow_address property.
+
+    Supported formats are unix:<path>, tcp:<host>:<port> and mgmt, which
+    stands for the management socket of the OVS bridge.
+    """
+    if address == 'mgmt':
+        address = 'unix:/var/run/openvswitch/{}.mgmt'.format(bridge)
+    kind, _, target = address.partition(':')
+    if kind == 'unix':
+        return socket.AF_UNIX, target
+    if kind == 'tcp':
+        host, _, port = target.rpartition(':')
+        return socket.AF_INET, (host, int(port))
+    raise OpenFlowError("unsupported openflow address {}".format(address))
+
+
+def encode_flow_stats_request(xid, cookie=0, cookie_mask=0, table_id=OFPTT_ALL):
+    body = MULTIPART_HEADER.pack(OFPMP_FLOW, 0) + FLOW_STATS_REQUEST.pack(
+        table_id, OFPP_ANY, OFPG_ANY, cookie, cookie_mask) + EMPTY_MATCH
+    return OFP_HEADER.pack(OFP_VERSION, OFPT_MULTIPART_REQUEST,
+                           OFP_HEADER.size + len(body), xid) + body
+
+
+def encode_group_stats_request(xid, group_id=OFPG_ALL):
+    body = MULTIPART_HEADER.pack(
+        OFPMP_GROUP, 0) + GROUP_STATS_REQUEST.pack(group_id)
+    return OFP_HEADER.pack(OFP_VERSION, OFPT_MULTIPART_REQUEST,
+                           OFP_HEADER.size + len(body), xid) + body
+
+
+def decode_flow_stats(body):
+    """Yields the flows of the body of a OFPMP_FLOW reply.
+
+    The flows have the same format as the ones read from ovs-ofctl.
+    """
+    offset = 0
+    while offset + FLOW_STATS.size <= len(body):
+        (length, table_id, _, _, _, _, _, _, cookie, packets,
+         byte_count) = FLOW_STATS.unpack_from(body, offset)
+        if length < FLOW_STATS.size:
+            raise OpenFlowError("wrong flow stats length {}".format(length))
+        offset += length
+        yield {'id': None, 'cookie': cookie, 'table': str(table_id),
+               'packets': str(packets), 'bytes': str(byte_count)}
+
+
+def decode_group_stats(body):
+    """Yields the groups of the body of a OFPMP_GROUP reply"""
+    offset = 0
+    while offset + GROUP_STATS.size <= len(body):
+        (length, group_id, _, packets, byte_count, _,
+         _) = GROUP_STATS.unpack_from(body, offset)
+        if length < GROUP_STATS.size:
+            raise OpenFlowError("wrong group stats length {}".format(length))
+        offset += length
+        yield {'id': str(group_id), 'packets': str(packets),
+               'bytes': str(byte_count)}
+
+
+class OpenFlowClient(object):
+
+    """OpenFlow 1.3 connection used to send multipart statistics requests"""
+
+    def __init__(self, address, bridge=None, timeout=30):
+        self.family, self.address = get_address(address, bridge)
+        self.timeout = timeout
+        self.sock = None
+        self.xid = 0
+
+    def connect(self):
+        logging.debug("OFCLIENT: connecting to %s", self.address)
+        self.sock = socket.socket(self.family, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.address)
+        self._send(OFPT_HELLO, '')
+        version, msg_type, _, _ = self._receive()
+        if msg_type != OFPT_HELLO:
+            raise OpenFlowError(
+                "unexpected message {} waiting for hello".format(msg_type))
+        if version < OFP_VERSION:
+            raise OpenFlowError(
+                "switch does not support OpenFlow 1.3 (version {})".format(version))
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def get_flows(self, cookie=0, cookie_mask=0, table_id=OFPTT_ALL):
+        self.xid += 1
+        request = encode_flow_stats_request(
+            self.xid, cookie, cookie_mask, table_id)
+        flows = []
+        for body in self._multipart(request, self.xid):
+            flows.extend(decode_flow_stats(body))
+        return flows
+
+    def get_groups(self):
+        self.xid += 1
+        groups = []
+        for body in self._multipart(encode_group_stats_request(self.xid), self.xid):
+            groups.extend(decode_group_stats(body))
+        return groups
+
+    def _multipart(self, request, xid):
+        """Sends a multipart request and yields the body of every reply"""
+        if not self.sock:
+            self.connect()
+        self.sock.sendall(request)
+        while True:
+            _, msg_type, msg_xid, body = self._receive()
+            if msg_type == OFPT_ERROR:
+                error_type, error_code = struct.unpack_from('!HH', body)
+                raise OpenFlowError("openflow error type {} code {}".format(
+                    error_type, error_code))
+            if msg_type != OFPT_MULTIPART_REPLY or msg_xid != xid:
+                continue
+            _, flags = MULTIPART_HEADER.unpack_from(body)
+            yield body[MULTIPART_HEADER.size:]
+            if not flags & OFPMPF_REPLY_MORE:
+                return
+
+    def _send(self, msg_type, body, xid=0):
+        self.sock.sendall(OFP_HEADER.pack(OFP_VERSION, msg_type,
+                                          OFP_HEADER.size + len(body), xid) + body)
+
+    def _receive(self):
+        """Returns the next message answering echo requests on the way"""
+        while True:
+            version, msg_type, length, xid = OFP_HEADER.unpack(
+                self._read(OFP_HEADER.size))
+            body = self._read(length - OFP_HEADER.size)
+            if msg_type == OFPT_ECHO_REQUEST:
+                self._send(OFPT_ECHO_REPLY, body, xid)
+                continue
+            return version, msg_type, xid, body
+
+    def _read(self, size):
+        data = ''
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise OpenFlowError("connection closed by the switch")
+            data += chunk
+        return data
@@ -1,32 +1,214 @@
 import json
 import logging
-
-cache = {}
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from flowmanager.utils import run_parallel
+
+DEFAULT_CACHE_TTL = 30
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ResponseCache(object):
+
+    """LRU cache of parsed RESTCONF responses keyed by (controller, url).
+
+    Entries expire after ttl seconds and the least recently used ones are
+    evicted once the size of the raw responses exceeds max_bytes.
+    """
+
+    def __init__(self, ttl=DEFAULT_CACHE_TTL, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0,
+                      'evictions': 0, 'invalidations': 0}
+
+    def configure(self, ttl=None, max_bytes=None, enabled=None):
+        with self.lock:
+            self.ttl = self.ttl if ttl is None else int(ttl)
+            self.max_bytes = self.max_bytes if max_bytes is None else int(
+                max_bytes)
+            self.enabled = self.enabled if enabled is None else bool(enabled)
+            self._evict()
+
+    def get(self, ctrl, url):
+        key = (ctrl.name, url)
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            expires, size, data = entry
+            if expires < time.time():
+                logging.debug("OPENFLOW: cache entry expired for %s", url)
+                self.size -= size
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            # re-insert to mark it as the most recently used
+            self.entries[key] = entry
+            self.stats['hits'] += 1
+            return data
+
+    def add(self, ctrl, url, data, size=0):
+        if not self.enabled or size > self.max_bytes:
+            return
+        key = (ctrl.name, url)
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self.entries[key] = (time.time() + self.ttl, size, data)
+            self.size += size
+            self._evict()
+
+    def invalidate(self, ctrl=None, url=None):
+        with self.lock:
+            for key in list(self.entries.keys()):
+                if ctrl is not None and key[0] != ctrl.name:
+                    continue
+                if url is not None and key[1] != url:
+                    continue
+                self.size -= self.entries.pop(key)[1]
+                self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self.entries)
+            stats['bytes'] = self.size
+            return stats
+
+    def _evict(self):
+        while self.entries and self.size > self.max_bytes:
+            key, entry = self.entries.popitem(last=False)
+            logging.debug("OPENFLOW: evicting %s from cache", key[1])
+            self.size -= entry[1]
+            self.stats['evictions'] += 1
+
+
+cache = ResponseCache()
 
 
 def get_from_cache_object(ctrl, url):
-    if ctrl.name in cache:
-        return cache[ctrl.name].get(url)
+    return cache.get(ctrl, url)
+
 
+def add_to_cache_object(ctrl, url, data, size=0):
+    cache.add(ctrl, url, data, size)
 
-def add_to_cache_object(ctrl, url):
-    if ctrl.name in cache:
-        return cache[ctrl.name].get(url)
+
+def invalidate_cache(ctrl=None):
+    """Drops cached responses, e.g. after a destructive command"""
+    logging.debug("OPENFLOW: invalidating cache")
+    cache.invalidate(ctrl)
 
 
 def get_from_api(ctrl, url, use_cache=True):
+    use_cache = use_cache and cache.enabled
     data = get_from_cache_object(ctrl, url) if use_cache else None
-    if not use_cache or not data:
+    if data is None:
         resp = ctrl.http_get(url)
         if resp is None or resp.status_code != 200 or resp.content is None:
             logging.debug("OPENFLOW: data not found for %s", url)
             return None
         data = json.loads(resp.content)
-        add_to_cache_object(ctrl, data)
+        if use_cache:
+            add_to_cache_object(ctrl, url, data, len(resp.content))
 
     return data
 
 
+def iter_json_list(chunks, key):
+    """Yields one by one the elements of the first list named key.
+
+    chunks is an iterable with consecutive pieces of a JSON document. Only
+    the element being decoded is kept in memory, so the size of the whole
+    document does not matter.
+    """
+    decoder = json.JSONDecoder()
+    start_regex = re.compile(r'"(?:[\w-]+:)?{}"\s*:\s*\['.format(key))
+    chunks = iter(chunks)
+    buf = ''
+    started = False
+    eof = False
+    # a failed decode is not retried until the buffer doubles its size,
+    # so large elements are parsed a bounded number of times
+    retry_size = 0
+    while True:
+        if not started:
+            match = start_regex.search(buf)
+            if match:
+                buf = buf[match.end():]
+                started = True
+                continue
+            # keep the tail, the key could be split between chunks
+            buf = buf[-len(key) - 64:]
+        else:
+            pos = 0
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos:
+                buf = buf[pos:]
+            if buf.startswith(']'):
+                return
+            if buf and (eof or len(buf) >= retry_size):
+                try:
+                    element, end = decoder.raw_decode(buf)
+                except ValueError:
+                    if eof:
+                        raise
+                    retry_size = len(buf) * 2
+                else:
+                    buf = buf[end:]
+                    retry_size = 0
+                    yield element
+                    continue
+        if eof:
+            return
+        try:
+            buf += next(chunks)
+        except StopIteration:
+            eof = True
+
+
+def stream_from_api(ctrl, url, key):
+    """Returns a generator of the elements of the list key as the response
+    is being read, or None if the data is not available"""
+    resp = ctrl.http_get(url, stream=True)
+    if resp is None or resp.status_code != 200:
+        logging.debug("OPENFLOW: data not found for %s", url)
+        if resp is not None:
+            resp.close()
+        return None
+
+    def iter_response():
+        try:
+            for element in iter_json_list(resp.iter_content(STREAM_CHUNK_SIZE), key):
+                yield element
+        finally:
+            resp.close()
+    return iter_response()
+
+
+def stream_openflow_nodes(ctrl, config=True):
+    url = (ctrl.get_config_url() if config else ctrl.get_operational_url()
+           ) + '/opendaylight-inventory:nodes'
+    return stream_from_api(ctrl, url, 'node')
+
+
 def get_topology(ctrl, topology_name, config=False, use_cache=True):
     url = (ctrl.get_config_url() if config else ctrl.get_operational_url()) + \
         '/network-topology:network-topology/topology/{}'.format(topology_name)
@@ -52,6 +234,61 @@ def get_operational_openflow(ctrl, use_cache=True):
     return get_openflow(ctrl=ctrl, config=False, use_cache=use_cache)
 
 
+def get_openflow_node_ids(ctrl, config=True):
+    """Lists the ids of the inventory nodes without their tables and groups"""
+    url = (ctrl.get_config_url() if config else ctrl.get_operational_url()
+           ) + '/opendaylight-inventory:nodes?depth=2'
+    data = get_from_api(ctrl, url, use_cache=False)
+    if data is None:
+        return None
+    nodes = data.get('nodes') or data.get('opendaylight-inventory:nodes') or {}
+    return [node['id'] for node in nodes.get('node') or []]
+
+
+def get_openflow_node(ctrl, node_id, config=True, retries=2, backoff=0.5):
+    """Gets a single inventory node, retrying on connection and server errors.
+
+    Retries wait backoff seconds, doubled after every attempt.
+    """
+    url = (ctrl.get_config_url() if config else ctrl.get_operational_url()
+           ) + '/opendaylight-inventory:nodes/node/{}'.format(node_id)
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            resp = ctrl.http_get(url)
+        except Exception, msg:
+            logging.debug("OPENFLOW: error getting %s: %s", url, msg)
+            resp = None
+        if resp is not None and resp.status_code == 200 and resp.content:
+            data = json.loads(resp.content)
+            nodes = data.get('node') if 'node' in data else data.get(
+                'opendaylight-inventory:node')
+            return nodes[0] if nodes else None
+        if resp is not None and resp.status_code < 500:
+            logging.debug("OPENFLOW: data not found for %s", url)
+            return None
+        logging.debug("OPENFLOW: attempt %d failed for %s", attempt + 1, url)
+
+    logging.error("OPENFLOW: cannot get %s node %s after %d attempts",
+                  'config' if config else 'operational', node_id, retries + 1)
+
+
+def get_openflow_sharded(ctrl, node_ids, max_workers=8, retries=2, backoff=0.5):
+    """Gets the config and operational inventories fetching every node of
+    both datastores in the same pool of parallel requests.
+
+    Returns the (config, operational) documents with the format of
+    get_openflow, nodes not found are left out.
+    """
+    tasks = [((config, node_id), partial(get_openflow_node, ctrl, node_id, config, retries, backoff))
+             for config in [True, False] for node_id in node_ids]
+    nodes = run_parallel(tasks, max_workers=max_workers)
+    return tuple({'nodes': {'node': [nodes[(config, node_id)] for node_id in node_ids
+                                     if nodes.get((config, node_id))]}}
+                 for config in [True, False])
+
+
 def get_fm_openflow(ctrl, use_cache=True):
     url = ctrl.get_operational_fm_url('openflow:nodes')
     return get_from_api(ctrl, url, use_cache)
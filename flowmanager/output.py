@@ -0,0 +1,87 @@
+"""
+This module writes the reports of fmcheck as JSON lines.
+
+With the jsonl format every message logged by the validations and every
+record of the stats and summary commands is written to stdout as one
+compact JSON object per line, as soon as it is produced. Each object has
+a type, 'finding' for messages logged as warnings or errors, 'log' for
+the other messages and the name of the report for the records.
+
+A RecordCollector keeps the records of the reports instead, whatever the
+format, e.g. to return them with the response of a served command.
+
+"""
+import json
+import logging
+import sys
+import threading
+from collections import OrderedDict
+
+FORMATS = ['text', 'jsonl']
+
+_format = 'text'
+_lock = threading.Lock()
+# records of the active RecordCollector, None to write them to stdout
+_records = None
+
+
+def set_format(name):
+    global _format
+    if name not in FORMATS:
+        raise ValueError("unknown format {}, supported formats are {}".format(
+            name, ', '.join(FORMATS)))
+    _format = name
+
+
+def is_jsonl():
+    """True if the reports must emit their records"""
+    return _format == 'jsonl' or _records is not None
+
+
+def emit(record_type, data):
+    """Writes a record of a report as a JSON line, or keeps it in the active
+    RecordCollector"""
+    record = OrderedDict([('type', record_type)])
+    record.update(data)
+    with _lock:
+        if _records is not None:
+            _records.append(record)
+            return
+    line = json.dumps(record, separators=(',', ':'), default=str)
+    with _lock:
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+
+class RecordCollector(object):
+
+    """Keeps the records emitted while active instead of writing them"""
+
+    def __init__(self):
+        self.records = []
+        self.previous = None
+
+    def __enter__(self):
+        global _records
+        with _lock:
+            self.previous, _records = _records, self.records
+        return self
+
+    def __exit__(self, *exc_info):
+        global _records
+        with _lock:
+            _records = self.previous
+
+
+class JsonLinesHandler(logging.Handler):
+
+    """Writes the messages logged as JSON lines"""
+
+    def emit(self, record):
+        try:
+            emit('finding' if record.levelno >= logging.WARNING else 'log',
+                 OrderedDict([('level', record.levelname),
+                              ('time', round(record.created, 3)),
+                              ('message', record.getMessage())]))
+        except Exception:
+            self.handleError(record)
@@ -2,8 +2,41 @@ import time
 import re
 import subprocess
 import logging
+import pexpect
 from flowmanager.switch import Switch
 from flowmanager.ssh import SSH
+from flowmanager.ofclient import OpenFlowClient
+from flowmanager.flow import get_prefix_filter
+
+FLOW_LINE = re.compile(
+    r'cookie=(0[xX][0-9a-fA-F]+),.*table=(\d+),.*n_packets=(\d+),.*n_bytes=(\d+)', re.IGNORECASE)
+GROUP_LINE = re.compile(
+    r'group_id=(\d+),duration=[\d]*.[\d]*s,ref_count=[\d]*,packet_count=(\d+),byte_count=(\d+)', re.IGNORECASE)
+
+
+def parse_flows(lines):
+    """Returns the flows of the lines of ovs-ofctl dump-flows"""
+    search = FLOW_LINE.search
+    flows = []
+    for line in lines:
+        match = search(line)
+        if match:
+            flows.append({'id': None, 'cookie': int(match.group(1), 16),
+                          'table': match.group(2), 'packets': match.group(3),
+                          'bytes': match.group(4)})
+    return flows
+
+
+def parse_groups(lines):
+    """Returns the groups of the lines of ovs-ofctl dump-group-stats"""
+    search = GROUP_LINE.search
+    groups = []
+    for line in lines:
+        match = search(line)
+        if match:
+            groups.append({'id': match.group(1), 'packets': match.group(2),
+                           'bytes': match.group(3)})
+    return groups
 
 
 class OVS(Switch):
@@ -25,6 +58,8 @@ class OVS(Switch):
         #     ip=self.ip, user=self.user, port=self.port, password=self.password)
         self.ssh = None if self.execute_local else SSH(ip=self.ip, user=self.user,
                                                        port=self.port, password=self.password)
+        # read flows/groups with OpenFlow requests instead of ovs-ofctl
+        self.openflow_address = props.get('openflow_address')
 
     def _execute_commands(self, commands):
         for command in commands:
@@ -82,51 +117,59 @@ class OVS(Switch):
     def delete_groups(self):
         return self._execute_command("sudo ovs-ofctl del-groups {} --protocol=Openflow13".format(self.name))
 
-    def get_flows(self):
-        output = self._execute_command(
-            "sudo ovs-ofctl dump-flows {} --protocol=Openflow13".format(self.name))
-        if not output:
-            return None
-
-        regex = re.compile(r'(cookie=.*)', re.IGNORECASE)
-        regexvalues = re.compile(
-            r'cookie=(0[xX][0-9a-fA-F]+),.*table=(\d+),.*n_packets=(\d+),.*n_bytes=(\d+)', re.IGNORECASE)
-
-        flows = []
-        flowid = None
-        for linematch in regex.finditer(output):
-            line = linematch.group(1)
-            for match in regexvalues.finditer(line):
-                flow = {}
-                flow['id'] = flowid
-                flow['cookie'] = int(match.group(1), 16)
-                flow['table'] = match.group(2)
-                flow['packets'] = match.group(3)
-                flow['bytes'] = match.group(4)
-                flows.append(flow)
-        logging.debug(flows)
-        return flows
+    def _get_openflow_client(self):
+        return OpenFlowClient(self.openflow_address, bridge=self.name)
+
+    def get_flows(self, prefix=None):
+        cookie, mask = get_prefix_filter(prefix) if prefix is not None else (0, 0)
+        if self.openflow_address:
+            client = self._get_openflow_client()
+            try:
+                return client.get_flows(cookie=cookie, cookie_mask=mask)
+            finally:
+                client.close()
+
+        flow_filter = ' cookie={:#x}/{:#x}'.format(
+            cookie, mask) if prefix is not None else ''
+        return self._parse_command_lines(
+            "sudo ovs-ofctl dump-flows {}{} --protocol=Openflow13".format(self.name, flow_filter), parse_flows)
 
     def get_groups(self):
-        output = self._execute_command(
-            "sudo ovs-ofctl dump-group-stats {} --protocol=Openflow13".format(self.name))
-        if not output:
-            return None
-        regex = re.compile(r'(group_id=.*)', re.IGNORECASE)
-        regexvalues = re.compile(
-            r'group_id=(\d+),duration=[\d]*.[\d]*s,ref_count=[\d]*,packet_count=(\d+),byte_count=(\d+)', re.IGNORECASE)
-
-        groups = []
-        for linematch in regex.finditer(output):
-            line = linematch.group(1)
-            for match in regexvalues.finditer(line):
-                group = {}
-                group['id'] = match.group(1)
-                group['packets'] = match.group(2)
-                group['bytes'] = match.group(3)
-                groups.append(group)
-
-        return groups
+        if self.openflow_address:
+            client = self._get_openflow_client()
+            try:
+                return client.get_groups()
+            finally:
+                client.close()
+
+        return self._parse_command_lines(
+            "sudo ovs-ofctl dump-group-stats {} --protocol=Openflow13".format(self.name), parse_groups)
+
+    def _parse_command_lines(self, command, parse):
+        """Parses the output of a command while it is being produced"""
+        try:
+            return parse(self._execute_command_lines(command))
+        except (subprocess.CalledProcessError, OSError, pexpect.ExceptionPexpect), msg:
+            logging.error("OVS: %s(%s) error executing %s: %s",
+                          self.name, self.openflow_name, command, msg)
+
+    def _execute_command_lines(self, command):
+        """Yields the output lines of a command as soon as they are read"""
+        if self.ssh:
+            logging.debug("OVS: streaming command: %s", command)
+            for line in self.ssh.execute_single_command_lines(command):
+                yield line
+            return
+
+        process = subprocess.Popen(
+            command, shell=True, stdout=subprocess.PIPE, bufsize=-1)
+        try:
+            for line in iter(process.stdout.readline, ''):
+                yield line
+        finally:
+            process.stdout.close()
+            if process.wait():
+                raise subprocess.CalledProcessError(process.returncode, command)
 
     def get_controllers_role(self):
         logging.info(
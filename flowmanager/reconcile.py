@@ -0,0 +1,179 @@
+"""
+This module reconciles the flows and groups of a switch with set operations.
+
+The keys reported by each source (config, operational, switch, flow manager
+and calculated) are collected once, and every mismatch class is computed as
+a set difference or intersection. Elements are assigned to the first class
+they match, in the order the flows and groups used to be checked one by
+one, so the findings are the same ones.
+
+"""
+import logging
+from flowmanager.flow import CALCULATED_EXCEPTIONS
+from flowmanager.flowstore import SOURCES
+
+
+def reconcile_switch(switch):
+    """Logs the group and flow errors of a switch, returns True if none"""
+    groups_ok = reconcile_groups(switch)
+    flows_ok = reconcile_flows(switch)
+    return groups_ok and flows_ok
+
+
+def reconcile_groups(switch):
+    groups = switch.groups
+    config = set(key for key, group in groups.iteritems() if group.of_config)
+    operational = set(
+        key for key, group in groups.iteritems() if group.of_operational)
+    running = set(key for key, group in groups.iteritems() if group.switch)
+    monitored = set(key for key, group in groups.iteritems() if group.fm)
+    calculated = set(
+        key for key, group in groups.iteritems() if group.calculated)
+
+    findings = _Findings()
+    findings.add(config - running,
+                 "%s(%s) group %s is not runnig in the switch. %s")
+    findings.add(config - operational,
+                 "%s(%s) group %s not found in operational datastore. %s")
+    findings.add(config - monitored,
+                 "%s(%s) group %s is not being monitored. %s")
+    findings.add(config - calculated,
+                 "%s(%s) group %s not found in calculated groups. %s")
+    findings.add(running - config,
+                 "%s(%s) group %s runnig in switch but not configured. %s")
+    findings.add(operational - config,
+                 "%s(%s) group %s found operational datastore but not in configuration. %s")
+    findings.add(monitored - config - operational - running,
+                 "%s(%s) group %s monitored but not running neither configured. %s")
+    findings.add(calculated - config,
+                 "%s(%s) group %s calculated but not configured. %s")
+
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    for key, group in groups.iteritems():
+        message = findings.get(key)
+        if message is None:
+            if debug:
+                logging.debug("GROUP: OK: %s %s", group.groupid,
+                              group._get_info_msg())
+            continue
+        logging.error(message, group.node, group.node_of_name,
+                      group.groupid, group._get_info_msg())
+        if group.raw:
+            logging.info("GROUP: %s(%s) group %s raw groups %s",
+                         group.node, group.node_of_name, group.groupid, group.raw)
+    return not findings
+
+
+def reconcile_flows(switch):
+    flows, (config, operational, running, monitored), calculated = _get_flow_sources(
+        switch)
+    # (id, version) mismatches are rare, find them once per pair of sources
+    store = switch.flow_store
+    if store is not None:
+        config_keys, operational_keys, running_keys, monitored_keys = [
+            store.get_present(source) for source in SOURCES]
+        running_skew = store.get_skew('of_config', 'switch')
+        operational_skew = store.get_skew('of_config', 'of_operational')
+    else:
+        config_keys = set(config)
+        operational_keys = set(operational)
+        running_keys = set(running)
+        monitored_keys = set(monitored)
+        running_skew = _skewed(config, running)
+        operational_skew = _skewed(config, operational)
+
+    findings = _Findings()
+    findings.add(_duplicated(config),
+                 "flow %s duplicated in configuration. %s")
+    findings.add(_duplicated(operational),
+                 "flow %s duplicated in operational. %s")
+    findings.add(_duplicated(running), "flow %s duplicated in switch. %s")
+    findings.add(_duplicated(monitored),
+                 "flow %s duplicated in monitored. %s")
+    findings.add(config_keys - running_keys,
+                 "flow %s is not runnig in the switch. %s")
+    # the flow checks took the operational presence from the configuration,
+    # so flows missing only in operational are classified by the next checks
+    findings.add(config_keys - monitored_keys,
+                 "flow %s is not being monitored. %s")
+    findings.add(set(key for key in config_keys - calculated
+                     if str(config[key][2]) not in CALCULATED_EXCEPTIONS),
+                 "flow %s not found in calculated flows. %s")
+    findings.add(running_keys - config_keys,
+                 "flow %s runnig in switch but not configured. %s")
+    findings.add(monitored_keys - config_keys - running_keys,
+                 "flow %s monitored but not running neither configured. %s")
+    findings.add(_different(running_skew, config, running, 4),
+                 "flow %s config and switch version is different. %s")
+    # flows missing only in operational made the flow checks fail comparing
+    # their versions
+    findings.add(config_keys - operational_keys,
+                 "flow %s not found in operational datastore. %s")
+    findings.add(_different(operational_skew, config, operational, 4),
+                 "flow %s config and operational version is different. %s")
+    findings.add(_different(running_skew, config, running, 3),
+                 "flow %s config and switch id is different. %s")
+    findings.add(_different(operational_skew, config, operational, 3),
+                 "flow %s config and operational id is different. %s")
+
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    for key, flow in flows:
+        message = findings.get(key)
+        if message is None:
+            if debug:
+                logging.debug("FLOW: OK: %s %s", flow.flowid,
+                              flow._get_info_msg())
+            continue
+        logging.error(message, flow.flowid, flow._get_info_msg())
+        if flow.raw:
+            logging.info("FLOW: %s raw flows %s", flow.flowid, flow.raw)
+    return not findings
+
+
+class _Findings(dict):
+
+    """Finding message by key, the first class added for a key wins"""
+
+    def add(self, keys, message):
+        for key in set(keys).difference(self):
+            self[key] = message
+
+
+def _duplicated(entries):
+    return set(key for key, entry in entries.iteritems() if entry[0] > 1)
+
+
+def _skewed(entries, others):
+    """Returns the keys in both sources whose id or version are different"""
+    get = others.get
+    return [key for key, entry in entries.iteritems()
+            if entry[3:] != (get(key) or entry)[3:]]
+
+
+def _different(keys, entries, others, field):
+    return set(key for key in keys if entries[key][field] != others[key][field])
+
+
+def _get_flow_sources(switch):
+    """Returns the flows of a switch by key, the entries of each source by
+    key and the keys of the calculated flows"""
+    store = switch.flow_store
+    if store is not None:
+        return (enumerate(store.rows()),
+                [store.get_entries(source) for source in SOURCES],
+                set(row for row, calculated in enumerate(store.calculated) if calculated))
+
+    config, operational, running, monitored = {}, {}, {}, {}
+    calculated = set()
+    for key, flow in switch.flows.iteritems():
+        if flow.of_config is not None:
+            config[key] = flow.of_config
+        if flow.of_operational is not None:
+            operational[key] = flow.of_operational
+        if flow.switch is not None:
+            running[key] = flow.switch
+        if flow.fm is not None:
+            monitored[key] = flow.fm
+        if flow.calculated:
+            calculated.add(key)
+    return switch.flows.iteritems(), [config, operational, running, monitored], calculated
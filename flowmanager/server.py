@@ -0,0 +1,157 @@
+"""
+This module serves the validations and stats commands over local HTTP.
+
+A warm process keeps the topology and its connections, and runs each
+command of a request as fmcheck would, returning as JSON its result, the
+records of the stats and summary reports as with --format=jsonl, and the
+messages it logged or printed. Requests are served one at a time, on a
+localhost TCP port or on a unix socket.
+
+    GET /links?stopped=true
+    GET /get-flow-node-stats?node=openflow:1&filter=f1&filter=f2
+
+"""
+import BaseHTTPServer
+import SocketServer
+import StringIO
+import json
+import logging
+import os
+import socket
+import sys
+import time
+import urlparse
+from flowmanager.output import RecordCollector
+from flowmanager.snapshot import FindingsRecorder
+from flowmanager.watch import CHECKS
+
+
+# options set when the server starts, they cannot change per request
+SERVER_OPTIONS = ['--controller', '--debug', '--format', '--interval',
+                  '--listen', '--topology']
+
+
+def is_served(command):
+    """True if a command can be run through the server"""
+    return command in CHECKS or command.startswith('get-')
+
+
+class CommandServer(BaseHTTPServer.HTTPServer):
+
+    """HTTP server running fmcheck commands against a warm topology.
+
+    execute is called with the topology and the docopt arguments of a
+    command, arguments are the ones the server was started with.
+    """
+
+    def __init__(self, address, topology, execute, arguments):
+        BaseHTTPServer.HTTPServer.__init__(self, address, CommandHandler)
+        self.topology = topology
+        self.execute = execute
+        self.arguments = arguments
+
+    def get_arguments(self, command, params):
+        """Returns the docopt arguments of a command and its query parameters.
+
+        Flags take a boolean, repeatable options every value and the other
+        options the last one. Options of the server itself are rejected.
+        """
+        arguments = dict(self.arguments)
+        arguments[command] = True
+        for name, values in params.iteritems():
+            if '<' + name + '>' in arguments:
+                name = '<' + name + '>'
+            elif '--' + name in SERVER_OPTIONS:
+                raise ValueError("{} is an option of the server".format(name))
+            elif '--' + name in arguments:
+                name = '--' + name
+            else:
+                raise ValueError("unknown parameter {}".format(name))
+            if isinstance(arguments[name], bool):
+                arguments[name] = values[-1].lower() in ('1', 'true', 'yes')
+            elif isinstance(arguments[name], list):
+                arguments[name] = values
+            else:
+                arguments[name] = values[-1]
+        return arguments
+
+    def run_command(self, command, arguments):
+        start = time.time()
+        output = StringIO.StringIO()
+        stdout, sys.stdout = sys.stdout, output
+        try:
+            with FindingsRecorder(level=logging.INFO) as recorder, \
+                    RecordCollector() as collector:
+                if command in CHECKS:
+                    self.topology.reset()
+                result = self.execute(self.topology, arguments)
+        finally:
+            sys.stdout = stdout
+        return {'command': command,
+                'result': result,
+                'ok': bool(result),
+                'records': collector.records,
+                'messages': [{'level': logging.getLevelName(level), 'message': message}
+                             for level, message in recorder.findings],
+                'output': output.getvalue(),
+                'seconds': round(time.time() - start, 3)}
+
+
+class UnixCommandServer(CommandServer):
+
+    """CommandServer listening on a unix socket"""
+
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        SocketServer.TCPServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+    def server_close(self):
+        CommandServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+class CommandHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        command = url.path.strip('/')
+        if not is_served(command):
+            return self._reply(404, {'error': "unknown command {}".format(command)})
+        try:
+            arguments = self.server.get_arguments(
+                command, urlparse.parse_qs(url.query))
+        except ValueError, msg:
+            return self._reply(400, {'error': str(msg)})
+        try:
+            response = self.server.run_command(command, arguments)
+        except Exception, msg:
+            logging.exception("SERVER: %s failed", command)
+            return self._reply(500, {'error': str(msg)})
+        self._reply(200, response)
+
+    do_POST = do_GET
+
+    def _reply(self, status, data):
+        body = json.dumps(data, default=str)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug("SERVER: " + format, *args)
+
+
+def get_server(listen, topology, execute, arguments):
+    """Returns the server for a listen address, unix:<path> or [host:]port"""
+    if listen.startswith('unix:'):
+        return UnixCommandServer(listen[len('unix:'):], topology, execute, arguments)
+    host, _, port = listen.rpartition(':')
+    return CommandServer((host or 'localhost', int(port)), topology, execute, arguments)
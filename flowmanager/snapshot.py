@@ -0,0 +1,147 @@
+"""
+This module persists the last reconciled state of every switch.
+
+For each switch the snapshot keeps a hash of its controller side data
+(flows and groups of config, operational, flow manager and calculated,
+without statistics), a hash of its last dump (cookies, tables and group
+ids, without counters) and the findings of its last check, so a later run
+can skip switches that did not change.
+
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+
+SNAPSHOT_VERSION = 1
+
+
+def get_controller_hash(switch):
+    """Returns the hash of the controller side elements of a switch"""
+    if switch.flow_store is not None:
+        flows = enumerate(switch.flow_store.rows())
+    else:
+        flows = switch.flows.iteritems()
+    elements = sorted((str(key), flow.of_config, flow.of_operational, flow.fm, flow.calculated)
+                      for key, flow in flows)
+    elements.extend(sorted((key, group.of_config, group.of_operational, group.fm, group.calculated)
+                           for key, group in switch.groups.iteritems()))
+    return hashlib.sha1(repr(elements)).hexdigest()
+
+
+def get_dump_hash(groups, flows):
+    """Returns the hash of a switch dump without its counters"""
+    elements = sorted((flow['cookie'], str(flow.get('table')))
+                      for flow in flows or [])
+    elements.extend(sorted(str(group['id']) for group in groups or []))
+    return hashlib.sha1(repr(elements)).hexdigest()
+
+
+class Snapshot(object):
+
+    """State of the switches in the last check, saved as JSON in path.
+
+    With max_age, a switch checked less than max_age seconds ago whose
+    controller data did not change is trusted without dumping it, so changes
+    made on the switch meanwhile are not seen. By default every switch is
+    dumped.
+    """
+
+    def __init__(self, path, max_age=0):
+        self.path = path
+        self.max_age = max_age
+        self.switches = {}
+
+    def load(self):
+        self.switches = {}
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (IOError, ValueError), msg:
+            logging.error("SNAPSHOT: cannot read %s: %s", self.path, msg)
+            return
+        if data.get('version') == SNAPSHOT_VERSION:
+            self.switches = data.get('switches') or {}
+
+    def save(self):
+        try:
+            with open(self.path, 'w') as f:
+                json.dump({'version': SNAPSHOT_VERSION,
+                           'switches': self.switches}, f)
+        except IOError, msg:
+            logging.error("SNAPSHOT: cannot write %s: %s", self.path, msg)
+
+    def get(self, name):
+        return self.switches.get(name)
+
+    def is_fresh(self, name, controller_hash):
+        """True if the switch was checked less than max_age seconds ago with
+        the same controller data"""
+        entry = self.switches.get(name)
+        return bool(self.max_age) and entry is not None and \
+            entry['controller'] == controller_hash and \
+            time.time() - entry['time'] < self.max_age
+
+    def is_unchanged(self, name, controller_hash, dump_hash):
+        entry = self.switches.get(name)
+        return entry is not None and entry['controller'] == controller_hash and \
+            entry['switch'] == dump_hash
+
+    def update(self, name, controller_hash, dump_hash, result, findings):
+        self.switches[name] = {'controller': controller_hash, 'switch': dump_hash,
+                               'time': time.time(), 'result': bool(result),
+                               'findings': findings}
+
+    def touch(self, name):
+        self.switches[name]['time'] = time.time()
+
+    def invalidate(self, name=None):
+        """Drops a switch, or all of them, so they are checked again"""
+        if name is None:
+            self.switches = {}
+        else:
+            self.switches.pop(name, None)
+
+    def replay(self, name):
+        """Logs again the findings of the last check of a switch"""
+        entry = self.switches[name]
+        for level, message in entry['findings']:
+            logging.log(level, '%s', message)
+        return entry['result']
+
+
+class FindingsRecorder(logging.Handler):
+
+    """Records the messages logged while a switch is checked.
+
+    With quiet the other handlers of the root logger are detached meanwhile,
+    so the messages are only recorded.
+    """
+
+    def __init__(self, level=logging.INFO, quiet=False):
+        logging.Handler.__init__(self, level)
+        self.findings = []
+        self.quiet = quiet
+        self.handlers = []
+
+    def emit(self, record):
+        self.findings.append((record.levelno, record.getMessage()))
+
+    def __enter__(self):
+        root = logging.getLogger()
+        if self.quiet:
+            self.handlers = root.handlers[:]
+            for handler in self.handlers:
+                root.removeHandler(handler)
+        root.addHandler(self)
+        return self
+
+    def __exit__(self, *args):
+        root = logging.getLogger()
+        root.removeHandler(self)
+        for handler in self.handlers:
+            root.addHandler(handler)
+        self.handlers = []
@@ -6,18 +6,238 @@ This module implements methods for SSH sessions.
 import threading
 import re
 import os
-import requests
-from requests.auth import HTTPBasicAuth
 import subprocess
 import json
 import pexpect
 import random
 import time
-import pdb
 import logging
 from functools import partial
 from pexpect import pxssh
 
+READ_CHUNK_SIZE = 64 * 1024
+# seconds an idle session has to answer an empty line before it is reused
+PROBE_TIMEOUT = 5
+
+
+class SSHSessionManager(object):
+
+    """Keeps authenticated pxssh sessions by (host, user, port).
+
+    Sequential commands to the same target reuse an open login instead of
+    creating a new one. Up to max_sessions sessions per target are kept so
+    concurrent callers are not serialized, sessions are kept alive with ssh
+    ServerAliveInterval and closed after idle_timeout seconds without use.
+    """
+
+    def __init__(self, max_sessions=4, idle_timeout=300, keepalive=30):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.condition = threading.Condition()
+        self.idle = {}
+        self.busy = {}
+        self.reaper = None
+        self.stats = {'logins': 0, 'reuses': 0, 'reconnects': 0,
+                      'failures': 0, 'idle_closed': 0}
+
+    def configure(self, max_sessions=None, idle_timeout=None, keepalive=None):
+        with self.condition:
+            self.max_sessions = self.max_sessions if max_sessions is None else int(
+                max_sessions)
+            self.idle_timeout = self.idle_timeout if idle_timeout is None else int(
+                idle_timeout)
+            self.keepalive = self.keepalive if keepalive is None else int(
+                keepalive)
+
+    def execute(self, ip, user, port, password, command, timeout=30):
+        """Runs the command and returns its output, None if it cannot be run.
+
+        A command is never sent twice: if the session fails once the command
+        was written it may have run, as a reboot would, so None is returned.
+        """
+        key = (ip, user, int(port) if port else 22)
+        session = self._acquire(key, password)
+        if session is None:
+            return None
+        try:
+            session.sendline(command)
+            logging.debug("%s@%s > %s", user, ip, command)
+            completed = session.prompt(timeout=timeout)
+            output = session.before
+        except (pexpect.EOF, pexpect.TIMEOUT, OSError), msg:
+            logging.debug("SSH: %s@%s session failed running %s: %s",
+                          user, ip, command, msg)
+            self._release(key, session, discard=True)
+            return None
+        logging.debug(output)
+        if not completed:
+            # the command is still running, the session cannot be reused
+            logging.debug("SSH: %s@%s timeout waiting for prompt", user, ip)
+        self._release(key, session, discard=not completed)
+        return output
+
+    def execute_lines(self, ip, user, port, password, command, timeout=30):
+        """Runs the command yielding its output lines while they are read.
+
+        As in execute the command is never sent twice, a session failing
+        once the command was written raises the error.
+        """
+        key = (ip, user, int(port) if port else 22)
+        session = self._acquire(key, password)
+        if session is None:
+            raise pexpect.ExceptionPexpect(
+                'cannot open a session to {}@{}'.format(user, ip))
+        completed = False
+        try:
+            session.sendline(command)
+            logging.debug("%s@%s > %s", user, ip, command)
+            for line in read_lines(session, re.compile(session.PROMPT), timeout):
+                yield line
+            completed = True
+        finally:
+            # a session not read up to the prompt cannot be reused
+            self._release(key, session, discard=not completed)
+
+    def get_stats(self):
+        with self.condition:
+            stats = dict(self.stats)
+            stats['open'] = sum([len(sessions) for sessions in self.idle.values()]) + \
+                sum(self.busy.values())
+            return stats
+
+    def close_idle(self, max_idle=None):
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        now = time.time()
+        expired = []
+        with self.condition:
+            for key, sessions in self.idle.items():
+                for entry in list(sessions):
+                    if now - entry[1] >= max_idle:
+                        sessions.remove(entry)
+                        expired.append((key, entry[0]))
+                        self.stats['idle_closed'] += 1
+        for key, session in expired:
+            logging.debug("SSH: closing idle session %s@%s", key[1], key[0])
+            _logout(session)
+
+    def close_all(self):
+        self.close_idle(max_idle=0)
+
+    def _acquire(self, key, password):
+        stale = []
+        session = None
+        with self.condition:
+            while True:
+                sessions = self.idle.get(key)
+                while sessions and session is None:
+                    candidate, last_used = sessions.pop()
+                    if candidate.isalive() and time.time() - last_used < self.idle_timeout:
+                        session = candidate
+                    else:
+                        stale.append(candidate)
+                if session is not None or self.busy.get(key, 0) < self.max_sessions:
+                    self.busy[key] = self.busy.get(key, 0) + 1
+                    break
+                self.condition.wait()
+            if session is not None:
+                self.stats['reuses'] += 1
+
+        for candidate in stale:
+            _logout(candidate)
+        if session is not None:
+            # a pooled session is checked before any command is written to
+            # it, so a dead one is replaced without running anything twice
+            if _is_responsive(session):
+                return session
+            logging.debug("SSH: %s@%s idle session not responding, logging in again",
+                          key[1], key[0])
+            _logout(session)
+            with self.condition:
+                self.stats['reconnects'] += 1
+
+        session = self._login(key, password)
+        if session is None:
+            with self.condition:
+                self.busy[key] -= 1
+                self.condition.notify()
+        return session
+
+    def _release(self, key, session, discard=False):
+        with self.condition:
+            self.busy[key] -= 1
+            if not discard and session.isalive():
+                self.idle.setdefault(key, []).append((session, time.time()))
+                session = None
+            self.condition.notify()
+        if session is not None:
+            _logout(session)
+
+    def _login(self, key, password):
+        ip, user, port = key
+        try:
+            session = pxssh.pxssh(
+                options={'ServerAliveInterval': str(self.keepalive)})
+            session.login(ip, user, password, port=port)
+        except (pxssh.ExceptionPxssh, pexpect.EOF, pexpect.TIMEOUT, OSError), msg:
+            logging.error(str(msg))
+            with self.condition:
+                self.stats['failures'] += 1
+            return None
+        with self.condition:
+            self.stats['logins'] += 1
+            self._start_reaper()
+        return session
+
+    def _start_reaper(self):
+        if self.reaper is not None:
+            return
+        self.reaper = threading.Thread(target=self._reap)
+        self.reaper.daemon = True
+        self.reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(max(1, min(self.idle_timeout, self.keepalive)))
+            self.close_idle()
+
+
+def read_lines(child, prompt, timeout):
+    """Yields the lines read from a pexpect child until the prompt regex.
+
+    The output is read in chunks and only the last incomplete line is kept,
+    pexpect.TIMEOUT or pexpect.EOF are raised if the prompt never arrives.
+    """
+    pending = ''
+    while True:
+        chunk = child.read_nonblocking(READ_CHUNK_SIZE, timeout)
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line
+        if prompt.search(pending):
+            return
+
+
+def _is_responsive(session):
+    try:
+        session.sendline('')
+        return session.prompt(timeout=PROBE_TIMEOUT)
+    except (pexpect.EOF, pexpect.TIMEOUT, OSError):
+        return False
+
+
+def _logout(session):
+    try:
+        if session.isalive():
+            session.logout()
+        session.close()
+    except Exception, msg:
+        logging.debug("SSH: error closing session %s", msg)
+
+
+sessions = SSHSessionManager()
+
 
 class SSH(object):
 
@@ -33,7 +253,7 @@ class SSH(object):
         self.session_open = False
 
     def is_session_open(self):
-        return self.session_open
+        return self.session_open and self.child.isalive()
 
     # def execute_single_command(self, command):
     #     target = "{}@{}".format(self.user, self.ip) if self.user else self.ip
@@ -66,23 +286,16 @@ class SSH(object):
     #     return True
 
     def execute_single_command(self, command, output=False):
-        try:
-            s = pxssh.pxssh()
-            s.login(self.ip, self.user, self.password)
-            s.sendline(command)
-            logging.debug("%s@%s > %s", self.user, self.ip, command)
-            try:
-                s.prompt()
-            except Exception, msg:
-                logging.debug(msg)
-            logging.debug(s.before)
-            if output:
-                return s.before
-            s.logout()
-            return True
-        except pxssh.ExceptionPxssh, msg:
-            logging.error(str(msg))
+        result = sessions.execute(self.ip, self.user, self.port, self.password,
+                                  command, timeout=self.timeout)
+        if result is None:
             return False
+        return result if output else True
+
+    def execute_single_command_lines(self, command):
+        """Returns a generator of the output lines of a command"""
+        return sessions.execute_lines(self.ip, self.user, self.port, self.password,
+                                      command, timeout=self.timeout)
 
     def create_session(self):
         ssh_command = 'ssh -o UserKnownHostsFile=/dev/null -o StrictHostKeyChecking=no -p {} {}@{}'.format(
@@ -90,23 +303,33 @@ class SSH(object):
         logging.debug('SSH: connecting to %s', ssh_command)
         self.child = pexpect.spawn(ssh_command)
         result = self.child.expect(
-            [pexpect.TIMEOUT, unicode('(?i)password')], timeout=self.timeout)
-        if result == 0:
+            [pexpect.TIMEOUT, pexpect.EOF, unicode('(?i)password')], timeout=self.timeout)
+        if result != 2:
             logging.error(
                 'ERROR: could not connect to noviflow via SSH. %s@%s port ({%s)', self.user, self.ip, self.port)
+            self.discard_session()
             return False
         else:
             self.child.sendline(self.password)
-            if self.child.expect([pexpect.TIMEOUT, unicode(self.prompt)], timeout=self.timeout) == 0:
+            if self.child.expect([pexpect.TIMEOUT, pexpect.EOF, unicode(self.prompt)], timeout=self.timeout) != 2:
+                self.discard_session()
                 return False
             else:
                 logging.debug('SSH session created with success')
                 self.session_open = True
                 return True
 
+    def discard_session(self):
+        """Kills the ssh process of a session that could not be used"""
+        self.session_open = False
+        try:
+            self.child.close(force=True)
+        except Exception, msg:
+            logging.debug("SSH: (%s) error closing session %s", self.ip, msg)
+
     def execute_command(self, command, prompt=None, timeout=None, eof=False):
-        if (not self.session_open):
-            self.create_session()
+        if not self.is_session_open() and not self.create_session():
+            return None
 
         prompt = prompt if prompt else self.prompt
         timeout = timeout if timeout else self.timeout
@@ -121,38 +344,84 @@ class SSH(object):
                 'SSH: (%s) command executed. Ouput is: \n %s', self.ip, self.child.before)
             return self.child.before
 
+    def execute_command_lines(self, command, prompt=None, timeout=None):
+        """Executes a command returning a generator of its output lines.
+
+        Lines are yielded while the output is still being read, so large
+        outputs are never buffered whole. The generator raises
+        pexpect.TIMEOUT if the prompt is not received in time.
+        """
+        if not self.is_session_open() and not self.create_session():
+            return None
+
+        prompt = prompt if prompt else self.prompt
+        timeout = timeout if timeout else self.timeout
+
+        logging.debug('SSH: (%s) streaming command %s , prompt %s, timeout %s',
+                      self.ip, command, prompt, timeout)
+        self.child.sendline(command)
+        return self._read_lines(prompt, timeout)
+
+    def _read_lines(self, prompt, timeout):
+        try:
+            for line in read_lines(self.child, re.compile(re.escape(prompt) + r'\s*$'), timeout):
+                yield line
+        except (pexpect.TIMEOUT, pexpect.EOF):
+            # the rest of the output would be read by the next command
+            self.close()
+            raise pexpect.TIMEOUT(
+                'prompt {} not received from {}'.format(prompt, self.ip))
+
     def close(self):
         logging.debug('SSH: (%s) closing connection.', self.ip)
         self.session_open = False
-        self.child.sendline('exit')
-        self.child.expect([pexpect.TIMEOUT, pexpect.EOF])
+        if self.child.isalive():
+            self.child.sendline('exit')
+            self.child.expect([pexpect.TIMEOUT, pexpect.EOF])
         self.child.close()
 
 
 class NoviflowSSH(SSH):
+
+    """Noviflow CLI session.
+
+    The hostname prompt is detected on the first login and reused when the
+    session has to be created again. Paging is checked on every login, a
+    new session may page again.
+    """
+
     def __init__(self, ip, user, port, password=None, prompt=None, timeout=3):
         SSH.__init__(self, ip, user, port, password,
                      prompt if prompt else "#", timeout)
+        self.hostname = None
+        self.paging_disabled = False
 
     def create_session(self):
+        self.paging_disabled = False
         result = super(NoviflowSSH, self).create_session()
-        if result:
+        if result and not self.hostname:
             result = self.execute_command('show config switch hostname')
             if result:
                 regex = re.compile(r'Hostname:\s*(\S+)', re.IGNORECASE)
                 match = regex.findall(self.child.before)
-                self.prompt = '{}#'.format(match[0]) if match else self.prompt
+                self.hostname = match[0] if match else None
+                self.prompt = '{}#'.format(
+                    self.hostname) if self.hostname else self.prompt
                 logging.debug('NOVIFLOW: current prompt %s', self.prompt)
 
-                result = self.execute_command('show config page')
-                if result:
-                    pageRegex = re.compile(r'(off)', re.IGNORECASE)
-                    pageConfig = pageRegex.findall(self.child.before)
-                    if not pageConfig:
-                        logging.debug("NOVIFLOW: disabling config page ")
-                        return self.execute_command('set config page off')
-                    else:
-                        return result
+        if result:
+            result = self.execute_command('show config page')
+            if result:
+                pageRegex = re.compile(r'(off)', re.IGNORECASE)
+                pageConfig = pageRegex.findall(self.child.before)
+                if not pageConfig:
+                    logging.debug("NOVIFLOW: disabling config page ")
+                    result = self.execute_command('set config page off')
+            self.paging_disabled = bool(result)
+
+        if not result:
+            self.discard_session()
+        return result
 
 
 '''
@@ -9,6 +9,7 @@ from flowmanager.link import Link
 from flowmanager.group import Group
 from flowmanager.flow import Flow
 from flowmanager.flow import get_id as get_flow_id
+from flowmanager.flowstore import FlowStore
 
 
 def get_switch_type(props):
@@ -38,9 +39,27 @@ class Switch(object):
         self.flows_by_name = {}
         self.flows_by_id = {}
         self.groups = {}
+        self.flow_store = None
         logging.debug('SWITCH: created switch %s(%s), type %s, ip %s, dpid %s',
                       self.name, self.openflow_name, self.type, self.ip, props['dpid'])
 
+    def reset(self):
+        """Forgets the state loaded from the controller and the switch"""
+        self.found_openflow_topology = False
+        self.found_sr_topology = False
+        self.found_connected = False
+        for name, link in self.links.items():
+            if link.expected_dst_name:
+                link.reset()
+            else:
+                del self.links[name]
+        self.flows = {}
+        self.flows_by_name = {}
+        self.flows_by_id = {}
+        self.groups = {}
+        if self.flow_store is not None:
+            self.flow_store = FlowStore(self.name, self.openflow_name)
+
     def get_link(self, source, expected_dst=None):
         source = unicode(source)
         if source not in self.links:
@@ -54,7 +73,22 @@ class Switch(object):
                 node=self.name, node_of_name=self.openflow_name, groupid=groupid)
         return self.groups[groupid]
 
-    def get_flow(self, table=None, name=None, cookie=None):
+    def set_flow_store(self, kind):
+        """Keeps the flows in a store of the given kind instead of Flow objects"""
+        if kind == 'columnar':
+            self.flow_store = FlowStore(self.name, self.openflow_name)
+        else:
+            logging.error("SWITCH: unknown flow store %s for %s(%s)",
+                          kind, self.name, self.openflow_name)
+
+    def get_flow(self, table=None, name=None, cookie=None, fm_id=None):
+        """Returns the flow by table and name or by cookie, adding it if needed.
+
+        fm_id is the flow manager id of the cookie when it is already known.
+        """
+        if self.flow_store is not None:
+            return self.flow_store.get_flow(table=table, name=name, cookie=cookie, fm_id=fm_id)
+
         cookie = str(cookie) if cookie is not None else None
         name = str(name) if name is not None else None
         table = str(table) if table is not None else None
@@ -64,7 +98,9 @@ class Switch(object):
 
         flow_name = "table/{}/name/{}".format(
             table, name) if table is not None and name is not None else None
-        flow_fm_id = str(get_flow_id(cookie)) if cookie is not None else None
+        if fm_id is None and cookie is not None:
+            fm_id = get_flow_id(cookie)
+        flow_fm_id = str(fm_id) if fm_id is not None else None
 
         current_flow = self.flows_by_name[flow_name] if flow_name and flow_name in self.flows_by_name else None
         current_flow = self.flows_by_id[flow_fm_id] if not current_flow and flow_fm_id and flow_fm_id in self.flows_by_id else current_flow
@@ -110,6 +146,10 @@ class Switch(object):
         else:
             return True
 
+    def close(self):
+        """Closes the connections opened to the switch"""
+        pass
+
     def reboot(self):
         raise Exception(
             'reboot method is not implemented by this switch {}'.format(self.name))
@@ -130,7 +170,12 @@ class Switch(object):
         raise Exception(
             'delete flows is not implemented by this switch {}'.format(self.name))
 
-    def get_flows(self):
+    def get_flows(self, prefix=None):
+        """Returns the flows running in the switch.
+
+        When prefix is given only the flows whose cookie has that prefix are
+        returned.
+        """
         raise Exception(
             'get flows method is not implemented by this switch {}'.format(self.name))
 
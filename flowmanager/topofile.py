@@ -0,0 +1,128 @@
+"""
+This module loads topology files.
+
+Parsed topologies, with the ports of their links already assigned, are
+cached with cPickle. Cache entries are keyed by the path of the file and
+checked against the SHA-1 of its content, so a file is parsed again only
+when it changes. The cache lives in ~/.cache/flowmanager, set the
+FM_TOPOLOGY_CACHE environment variable to another directory or to an
+empty value to disable it.
+
+Loading a pickle can run code, so the cache directory is created private
+and entries are only read when the entry and its directory belong to the
+user and nobody else can write them.
+
+"""
+import cPickle
+import hashlib
+import logging
+import os
+import stat
+import tempfile
+from flowmanager.utils import check_mandatory_values
+
+CACHE_VERSION = 1
+CACHE_DIR_ENV = 'FM_TOPOLOGY_CACHE'
+DEFAULT_CACHE_DIR = '~/.cache/flowmanager'
+
+
+def load_yaml(stream):
+    """Parses a YAML document with the libyaml loader when available"""
+    import yaml
+    return yaml.load(stream, Loader=getattr(yaml, 'CLoader', yaml.Loader))
+
+
+def get_cache_dir():
+    """Returns the directory of the cache, None if it is disabled"""
+    path = os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+    return os.path.expanduser(path) if path else None
+
+
+def load_topology_file(path):
+    """Returns the props of a topology file with the link ports assigned"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha1(content).hexdigest()
+
+    cache_dir = get_cache_dir()
+    cache_file = os.path.join(cache_dir, hashlib.sha1(
+        os.path.abspath(path)).hexdigest() + '.pickle') if cache_dir else None
+    props = _read_cache(cache_file, digest) if cache_file else None
+    if props is not None:
+        logging.debug("TOPOFILE: %s loaded from %s", path, cache_file)
+        return props
+
+    props = load_yaml(content)
+    if isinstance(props, dict):
+        assign_link_ports(props)
+        if cache_file:
+            _write_cache(cache_file, digest, props)
+    return props
+
+
+def _is_private(path):
+    """True if a path belongs to the user and only the user can write it"""
+    info = os.stat(path)
+    return info.st_uid == os.getuid() and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def _read_cache(cache_file, digest):
+    if not os.path.isfile(cache_file):
+        return None
+    try:
+        if not _is_private(cache_file) or not _is_private(os.path.dirname(cache_file)):
+            logging.warning("TOPOFILE: ignoring cache %s, it or its directory can be "
+                            "written by other users", cache_file)
+            return None
+        with open(cache_file, 'rb') as f:
+            version, cached_digest, props = cPickle.load(f)
+    except Exception, msg:
+        logging.debug("TOPOFILE: cannot read cache %s: %s", cache_file, msg)
+        return None
+    return props if version == CACHE_VERSION and cached_digest == digest else None
+
+
+def _write_cache(cache_file, digest, props):
+    """Writes a cache entry, failures only mean the next run parses again"""
+    try:
+        directory = os.path.dirname(cache_file)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0700)
+        handle, temp_file = tempfile.mkstemp(dir=directory)
+        with os.fdopen(handle, 'wb') as f:
+            cPickle.dump((CACHE_VERSION, digest, props), f,
+                         cPickle.HIGHEST_PROTOCOL)
+        os.rename(temp_file, cache_file)
+    except (IOError, OSError, cPickle.PicklingError), msg:
+        logging.debug("TOPOFILE: cannot write cache %s: %s", cache_file, msg)
+
+
+def assign_link_ports(props):
+    """Numbers the ports of the links of a topology not giving them.
+
+    Ports are assigned in order of appearance from 1 for every switch, the
+    link dicts are updated with the source_port and destination_port.
+    """
+    switches = {}
+    for properties in props.get('switch') or []:
+        check_mandatory_values(properties, ['name', 'dpid'])
+        switches[unicode(properties['name'])] = "openflow:" + \
+            str(int(properties['dpid'], 16))
+    # same lookups as Topology.get_switch
+    by_openflow_name = dict((name, name) for name in switches.values())
+    by_dpid = dict((name.split(':')[1], name) for name in switches.values())
+
+    def get_openflow_name(name):
+        name = str(name)
+        return switches.get(name) or by_openflow_name.get(name) or \
+            by_openflow_name.get('openflow:' + name) or by_dpid.get(name)
+
+    ports = {}
+    for link in props.get('link') or []:
+        check_mandatory_values(link, ['source', 'destination'])
+        for end in ('source', 'destination'):
+            name = get_openflow_name(link[end])
+            if name and not link.get(end + '_port'):
+                link[end + '_port'] = ports.get(name, 1)
+                ports[name] = link[end + '_port'] + 1
+    return props
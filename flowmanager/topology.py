@@ -6,29 +6,74 @@ and links. It provides the basic primitives to access to topology information.
 """
 
 import threading
+import time
 import logging
 import json
 import re
 import random
+from functools import partial
 from flowmanager.controller import Controller
 from flowmanager.switch import get_switch_type
 from flowmanager.switch import Switch
-from flowmanager.ovs import OVS
-from flowmanager.noviflow import Noviflow
 from flowmanager.utils import check_mandatory_values
+from flowmanager.topofile import assign_link_ports
+from flowmanager.utils import run_parallel
+from flowmanager.utils import run_tasks
 from flowmanager.host import Host
+from flowmanager.reconcile import reconcile_switch
+from flowmanager.snapshot import Snapshot
+from flowmanager.snapshot import FindingsRecorder
+from flowmanager.snapshot import get_controller_hash
+from flowmanager.snapshot import get_dump_hash
+from flowmanager.flow import Flow
+from flowmanager.flow import decode_cookies
+from flowmanager.group import Group
 import flowmanager.openflow as openflow
+import flowmanager.ssh as ssh
 
 
 class Topology(object):
 
     def __init__(self, props):
-        # Disable warnings
-        try:
-            from requests.packages.urllib3.exceptions import InsecureRequestWarning
-            from requests.packages.urllib3.disable_warnings import InsecureRequestWarning
-        except ImportError:
-            pass
+        # responses are cached for the lifetime of this topology
+        cache_props = props.get('cache') or {}
+        openflow.cache.configure(ttl=cache_props.get('ttl'),
+                                 max_bytes=cache_props.get('max_bytes'),
+                                 enabled=cache_props.get('enabled'))
+        openflow.cache.clear()
+
+        ssh_props = props.get('ssh') or {}
+        ssh.sessions.configure(max_sessions=ssh_props.get('max_sessions'),
+                               idle_timeout=ssh_props.get('idle_timeout'),
+                               keepalive=ssh_props.get('keepalive'))
+
+        self.fetch_workers = 8 if not props.get(
+            'fetch_workers') else int(props['fetch_workers'])
+        self.switch_workers = 16 if not props.get(
+            'switch_workers') else int(props['switch_workers'])
+        self.switch_timeout = 300 if props.get(
+            'switch_timeout') is None else int(props['switch_timeout'])
+        self.stream_inventory = bool(props.get('stream_inventory'))
+        self.sharded_inventory = bool(props.get('sharded_inventory'))
+        self.inventory_workers = 8 if not props.get(
+            'inventory_workers') else int(props['inventory_workers'])
+        self.inventory_retries = 2 if props.get(
+            'inventory_retries') is None else int(props['inventory_retries'])
+        self.inventory_backoff = 0.5 if props.get(
+            'inventory_backoff') is None else float(props['inventory_backoff'])
+        # raw flows and groups are kept to be reported with the errors
+        Flow.keep_raw = Group.keep_raw = bool(props.get('keep_raw'))
+        # incremental checks only re-check the switches changed since the
+        # last run recorded in the snapshot file, max_age also skips dumping
+        # the switches checked recently, ignoring the changes on the switch
+        snapshot = props.get('snapshot') or {}
+        self.snapshot = Snapshot(snapshot['file'], max_age=int(snapshot.get(
+            'max_age') or 0)) if snapshot.get('file') else None
+        # columnar keeps the flows of each switch in typed arrays
+        self.flow_store = props.get('flow_store')
+        # only flows with this cookie prefix are dumped and checked
+        self.cookie_prefix = None if props.get(
+            'cookie_prefix') is None else int(str(props['cookie_prefix']), 0)
 
         self.hosts = {}
         self.hosts_by_openflow_name = {}
@@ -42,12 +87,8 @@ class Topology(object):
         self.switches_by_dpid = {}
         if props.get('switch'):
             for properties in props['switch']:
-                switch_type = get_switch_type(properties)
-                if switch_type and switch_type == 'noviflow':
-                    new_switch = Noviflow(properties, True)
-                else:
-                    new_switch = OVS(properties, True)
-
+                new_switch = _get_switch_class(
+                    get_switch_type(properties))(properties, True)
                 self.add_switch(new_switch)
                 # logging.info(self.switches.values())
 
@@ -71,40 +112,18 @@ class Topology(object):
 
         self.links = {}
         if props.get('link'):
-            ports = {}
+            assign_link_ports(props)
             for link in props['link']:
-                check_mandatory_values(link, ['source', 'destination'])
-
                 src_switch = self.get_switch(link['source'])
-                src_name = src_switch.openflow_name if src_switch else None
-
                 dst_switch = self.get_switch(link['destination'])
-                dst_name = dst_switch.openflow_name if dst_switch else None
 
                 src_host = self.get_host(
                     link['source']) if not src_switch else None
                 dst_host = self.get_host(
                     link['destination']) if not dst_switch else None
 
-                source = None
-                if src_switch:
-                    src_port = link.get('source_port')
-                    if not src_port:
-                        if src_name not in ports:
-                            ports[src_name] = 1
-                        link['source_port'] = ports[src_name]
-                        src_port = ports[src_name]
-                        ports[src_name] = ports[src_name] + 1
-
-                destination = None
-                if dst_switch:
-                    dst_port = link.get('destination_port')
-                    if not dst_port:
-                        if dst_name not in ports:
-                            ports[dst_name] = 1
-                        link['destination_port'] = ports[dst_name]
-                        dst_port = ports[dst_name]
-                        ports[dst_name] = ports[dst_name] + 1
+                src_port = link.get('source_port')
+                dst_port = link.get('destination_port')
 
                 # add the links
                 if src_switch and dst_switch:
@@ -121,6 +140,18 @@ class Topology(object):
                     dst_switch.get_link(
                         dst_switch.openflow_name + ':' + str(dst_port), src_host.openflow_name)
 
+    def close(self):
+        """Releases the connections held by the topology elements"""
+        logging.debug("TOPOLOGY: cache stats %s", openflow.cache.get_stats())
+        for switch in self.switches.values():
+            switch.close()
+        logging.debug("TOPOLOGY: ssh session stats %s", ssh.sessions.get_stats())
+        ssh.sessions.close_all()
+        for controller in self.controllers.values():
+            logging.debug("TOPOLOGY: controller %s http stats %s",
+                          controller.name, controller.get_http_stats())
+            controller.close()
+
     def add_host(self, host):
         self.hosts[host.name] = host
         self.hosts_by_openflow_name[host.openflow_name] = host
@@ -152,7 +183,26 @@ class Topology(object):
     def get_all_controllers(self):
         return [controller for controller in self.controllers.values()]
 
+    def reset(self, invalidate_cache=True):
+        """Forgets the state loaded by previous validations.
+
+        Switches not in the topology file are dropped and, unless told
+        otherwise, the cached responses are invalidated. Connections are
+        kept open.
+        """
+        for switch in self.switches.values():
+            if not switch.expected:
+                del self.switches[switch.name]
+                del self.switches_by_openflow_name[switch.openflow_name]
+                del self.switches_by_dpid[switch.dpid]
+            else:
+                switch.reset()
+        if invalidate_cache:
+            openflow.invalidate_cache()
+
     def add_switch(self, switch):
+        if self.flow_store:
+            switch.set_flow_store(self.flow_store)
         self.switches[switch.name] = switch
         self.switches_by_openflow_name[switch.openflow_name] = switch
         self.switches_by_dpid[switch.dpid] = switch
@@ -279,114 +329,148 @@ class Topology(object):
                     src_port).add_sr_dst(dst_port)
 
     def validate_openflow_elements(self, check_stats=False):
+        if self.snapshot is not None:
+            return self.validate_openflow_elements_incremental()
+
         self.load_openflow_elements()
         result = True
         for switch in self.switches.values():
-            for group in switch.groups.values():
-                result = False if not group.check() else result
-            for flow in switch.flows.values():
-                result = False if not flow.check() else result
+            result = False if not reconcile_switch(switch) else result
 
         return result
 
-    def load_openflow_elements(self):
+    def validate_openflow_elements_incremental(self):
+        """Checks only the switches changed since the snapshot.
+
+        Switches whose controller data and dump did not change are not
+        checked, their last findings are reported again. With max_age,
+        switches checked less than max_age seconds ago whose controller data
+        did not change are not dumped either.
+        """
+        self.snapshot.load()
         ctrl = self.default_ctrl
 
-        # load groups
-        nodes = openflow.get_config_openflow(ctrl)
-        if nodes is not None and 'nodes' in nodes and 'node' in nodes['nodes']:
-            for node in nodes['nodes']['node']:
-                name = node['id']
-                if not name.startswith('openflow:'):
-                    continue
-                if not self.get_switch(name):
-                    self.add_switch_by_openflow_name(name)
-                switch = self.get_switch(name)
-                groups = node.get('group') if 'group' in node else node.get(
-                    'flow-node-inventory:group')
-                if groups:
-                    for group in groups:
-                        switch.get_group(
-                            group['group-id']).add_of_config(group)
-
-                tables = node.get('table') if 'table' in node else node.get(
-                    'flow-node-inventory:table')
-                if tables:
-                    for table in tables:
-                        table_id = table['id']
-                        flows = table.get('flow') if 'flow' in table else table.get(
-                            'flow-node-inventory:flow')
-                        if flows:
-                            for flow in flows:
-                                switch.get_flow(table=table_id, name=flow['id'], cookie=flow.get(
-                                    'cookie')).add_of_config(flow)
-
-        nodes = openflow.get_operational_openflow(ctrl)
-        if nodes is not None and 'nodes' in nodes and 'node' in nodes['nodes']:
-            for node in nodes['nodes']['node']:
-                name = node['id']
-                if not name.startswith('openflow:'):
-                    continue
-                if not self.get_switch(name):
-                    self.add_switch_by_openflow_name(name)
-                switch = self.get_switch(name)
-                groups = node.get('group') if 'group' in node else node.get(
-                    'flow-node-inventory:group')
-                if groups:
-                    for group in groups:
-                        switch.get_group(
-                            group['group-id']).add_of_operational(group)
-
-                tables = node.get('table') if 'table' in node else node.get(
-                    'flow-node-inventory:table')
-                if tables:
-                    for table in tables:
-                        table_id = table['id']
-                        flows = table.get('flow') if 'flow' in table else table.get(
-                            'flow-node-inventory:flow')
-                        if flows:
-                            for flow in flows:
-                                switch.get_flow(table=table_id, name=flow['id'], cookie=flow.get(
-                                    'cookie')).add_of_operational(flow)
-
-        nodes = openflow.get_fm_openflow(ctrl)
-        if nodes is not None and 'nodes' in nodes and 'node' in nodes['nodes']:
-            for node in nodes['nodes']['node']:
-                name = node['id']
-                if not name.startswith('openflow:'):
-                    continue
-                if not self.get_switch(name):
-                    self.add_switch_by_openflow_name(name)
-                switch = self.get_switch(name)
-                groups = node.get('group') if 'group' in node else node.get(
-                    'flow-node-inventory:group')
-                if groups:
-                    for group in groups:
-                        switch.get_group(group['id']).add_fm(group)
-
-                tables = node.get('table') if 'table' in node else node.get(
-                    'flow-node-inventory:table')
-                if tables:
-                    for table in tables:
-                        table_id = table['id']
-                        flows = table.get('flow') if 'flow' in table else table.get(
-                            'flow-node-inventory:flow')
-                        if flows:
-                            for flow in flows:
-                                switch.get_flow(table=table_id, name=flow['id'], cookie=flow.get(
-                                    'cookie')).add_fm(flow)
-
-        threads = []
+        # switches without a usable entry are dumped while the controller
+        # data is fetched, the ones found only in the inventory are not
+        switches = self.switches.values()
+        pending = [switch for switch in switches
+                   if not self.snapshot.max_age or not self.snapshot.get(switch.name) or
+                   time.time() - self.snapshot.get(switch.name)['time'] >= self.snapshot.max_age]
+        dumps = self._start_switch_loader(pending)
+
+        data = self.fetch_openflow_elements(ctrl)
+        if self.sharded_inventory:
+            self.fetch_sharded_inventory(ctrl, data)
+        self._load_controller_elements(ctrl, data)
+        self._load_calculated_elements(ctrl, data)
+
+        controller_hashes = dict((switch.name, get_controller_hash(switch))
+                                 for switch in self.switches.values())
+        dumped = set(switch.name for switch in pending)
+        changed = [switch for switch in switches if switch.name not in dumped and
+                   not self.snapshot.is_fresh(switch.name, controller_hashes[switch.name])]
+        results = dumps.join() + self.load_openflow_from_switches(changed)
+        dump_hashes = self._load_switch_results(results)
+
+        result = True
+        checked = 0
         for switch in self.switches.values():
-            t = threading.Thread(
-                target=_load_openflow_from_switch, args=(switch,))
-            threads.append(t)
-            t.start()
-        for t in threads:
-            t.join()
+            controller_hash = controller_hashes[switch.name]
+            dump_hash = dump_hashes.get(switch.name)
+            if switch.name not in dump_hashes and self.snapshot.is_fresh(switch.name, controller_hash) or \
+                    self.snapshot.is_unchanged(switch.name, controller_hash, dump_hash):
+                if switch.name in dump_hashes:
+                    self.snapshot.touch(switch.name)
+                result = False if not self.snapshot.replay(switch.name) else result
+                continue
+
+            checked += 1
+            with FindingsRecorder() as recorder:
+                switch_result = reconcile_switch(switch)
+            result = False if not switch_result else result
+            if switch not in switches:
+                continue
+            if dump_hash is None:
+                # the switch could not be dumped, check it again next time
+                self.snapshot.invalidate(switch.name)
+            else:
+                self.snapshot.update(switch.name, controller_hash, dump_hash,
+                                     switch_result, recorder.findings)
+
+        self.snapshot.save()
+        logging.info("TOPOLOGY: checked %d switches, %d unchanged since the last check",
+                     checked, len(self.switches) - checked)
+        return result
+
+    def invalidate_snapshot(self, name=None):
+        """Checks a switch, or all of them, again in the next incremental run"""
+        if self.snapshot is None:
+            return
+        self.snapshot.load()
+        switch = self.get_switch(name) if name else None
+        self.snapshot.invalidate(switch.name if switch else None)
+        self.snapshot.save()
 
+    def load_openflow_elements(self):
+        ctrl = self.default_ctrl
+
+        # switch dumps do not depend on the controller data, run them while
+        # the datastores are being fetched
+        dumps = self._start_switch_loader(self.switches.values())
+
+        data = self.fetch_openflow_elements(ctrl)
+        if self.sharded_inventory:
+            self.fetch_sharded_inventory(ctrl, data)
+        self._load_controller_elements(ctrl, data)
+        self._load_switch_results(dumps.join())
+        self._load_calculated_elements(ctrl, data)
+
+    def _start_switch_loader(self, switches):
+        """Dumps the switches in a background thread, join() returns the results"""
+        loader = _SwitchLoader(self, switches)
+        loader.start()
+        return loader
+
+    def _load_controller_elements(self, ctrl, data):
+        nodes = self._get_inventory_nodes(ctrl, data, config=True)
+        if nodes is not None:
+            self._load_inventory_nodes(nodes, 'of_config')
+
+        nodes = self._get_inventory_nodes(ctrl, data, config=False)
+        if nodes is not None:
+            self._load_inventory_nodes(nodes, 'of_operational')
+
+        nodes = data.get('fm')
+        if nodes is not None and 'nodes' in nodes and 'node' in nodes['nodes']:
+            self._load_inventory_nodes(
+                nodes['nodes']['node'], 'fm', group_key='id')
+
+    def _load_switch_results(self, results):
+        """Adds the dumped groups and flows to the switches.
+
+        Returns the hash of the dump by switch name.
+        """
+        dump_hashes = {}
+        for result in results:
+            switch = self.get_switch(result.key)
+            if not result.ok():
+                continue
+            # groups and flows are dumped separately, a failed dump is None
+            groups, flows, (_, ids, versions), errors = result.value
+            if groups:
+                for group in groups:
+                    switch.get_group(group['id']).add_switch(group)
+            if flows:
+                for flow, fm_id, version in zip(flows, ids, versions):
+                    switch.get_flow(cookie=flow['cookie'], fm_id=fm_id).add_switch(
+                        flow, (fm_id, version))
+            if self.snapshot is not None and not errors:
+                dump_hashes[switch.name] = get_dump_hash(groups, flows)
+        return dump_hashes
+
+    def _load_calculated_elements(self, ctrl, data):
         # load calculated groups
-        topology = openflow.get_topology(ctrl, 'flow:1:sr')
+        topology = data.get('sr')
         nodes = topology.get('node') if topology else None
         if nodes is not None:
             for node in nodes:
@@ -395,37 +479,147 @@ class Topology(object):
                 if brocadesr is not None:
                     self.process_calculated(brocadesr)
 
-        paths = openflow.get_paths(ctrl)
-        if paths:
-            for path in paths:
-                self.process_calculated(path)
-
-        elines = openflow.get_elines(ctrl)
-        if elines:
-            for eline in elines:
-                self.process_calculated(eline)
-
-        treepaths = openflow.get_treepaths(ctrl)
-        if treepaths:
-            for treepath in treepaths:
-                self.process_calculated(treepath)
-
-        etrees = openflow.get_etrees(ctrl)
-        if etrees:
-            for etree in etrees:
-                self.process_calculated(etree)
-
-        nodes = openflow.get_path_mpls_nodes(ctrl)
-        if nodes:
-            self.process_calculated(nodes)
-
-        nodes = openflow.get_etree_sr_nodes(ctrl)
-        if nodes:
-            self.process_calculated(nodes)
-
-        nodes = openflow.get_eline_mpls_nodes(ctrl)
-        if nodes:
-            self.process_calculated(nodes)
+        for name in ['paths', 'elines', 'treepaths', 'etrees']:
+            elements = data.get(name)
+            if elements:
+                for element in elements:
+                    self.process_calculated(element)
+
+        for name in ['path_mpls_nodes', 'etree_sr_nodes', 'eline_mpls_nodes']:
+            nodes = data.get(name)
+            if nodes:
+                self.process_calculated(nodes)
+
+    def load_openflow_from_switches(self, switches):
+        """Dumps the groups and flows of the switches in a bounded pool.
+
+        Returns a TaskResult by switch name with the (groups, flows) dumped.
+        """
+        tasks = [(switch.name, partial(_load_openflow_from_switch, switch, self.cookie_prefix))
+                 for switch in switches]
+        step = max(10, len(tasks) / 10)
+
+        def progress(result, finished, total):
+            switch = self.get_switch(result.key)
+            if result.timed_out:
+                logging.error("TOPOLOGY: timeout after %ds getting flows and groups from %s(%s)",
+                              result.elapsed, switch.name, switch.openflow_name)
+            elif result.error is not None:
+                logging.error("TOPOLOGY: error getting flows and groups from %s(%s): %s",
+                              switch.name, switch.openflow_name, result.error)
+            else:
+                for name, error in result.value[3]:
+                    logging.error("TOPOLOGY: error getting %s from %s(%s): %s",
+                                  name, switch.name, switch.openflow_name, error)
+                logging.debug("TOPOLOGY: %s(%s) dumped in %.2fs", switch.name,
+                              switch.openflow_name, result.elapsed)
+            if finished % step == 0 or finished == total:
+                logging.info("TOPOLOGY: loaded openflow elements from %d/%d switches",
+                             finished, total)
+
+        return run_tasks(tasks, max_workers=self.switch_workers,
+                         timeout=self.switch_timeout, progress=progress)
+
+    def fetch_openflow_elements(self, ctrl):
+        """Fetches concurrently the datastores used to validate openflow elements"""
+        # resolve the REST API prefix once before fanning out
+        ctrl.get_fm_prefix()
+        tasks = []
+        if not self.stream_inventory and not self.sharded_inventory:
+            tasks.append(
+                ('config', partial(openflow.get_config_openflow, ctrl)))
+            tasks.append(
+                ('operational', partial(openflow.get_operational_openflow, ctrl)))
+        if self.sharded_inventory:
+            tasks.append(
+                ('config_ids', partial(openflow.get_openflow_node_ids, ctrl, True)))
+            tasks.append(
+                ('operational_ids', partial(openflow.get_openflow_node_ids, ctrl, False)))
+            tasks.append(
+                ('topology_ids', partial(openflow.get_topology_nodes, ctrl, 'flow:1')))
+        tasks += [
+            ('fm', partial(openflow.get_fm_openflow, ctrl)),
+            ('sr', partial(openflow.get_topology, ctrl, 'flow:1:sr')),
+            ('paths', partial(openflow.get_paths, ctrl)),
+            ('elines', partial(openflow.get_elines, ctrl)),
+            ('treepaths', partial(openflow.get_treepaths, ctrl)),
+            ('etrees', partial(openflow.get_etrees, ctrl)),
+            ('path_mpls_nodes', partial(openflow.get_path_mpls_nodes, ctrl)),
+            ('etree_sr_nodes', partial(openflow.get_etree_sr_nodes, ctrl)),
+            ('eline_mpls_nodes', partial(openflow.get_eline_mpls_nodes, ctrl))
+        ]
+        return run_parallel(tasks, max_workers=self.fetch_workers)
+
+    def fetch_sharded_inventory(self, ctrl, data):
+        """Fetches the config and operational inventory node by node.
+
+        The nodes requested are the ones listed by both inventories, the
+        ones expected by the topology, the ones in the openflow topology and
+        the ones monitored by flow manager.
+        """
+        node_ids = set(
+            [switch.openflow_name for switch in self.switches.values()])
+        for config in [True, False]:
+            ids = data.get('config_ids' if config else 'operational_ids')
+            if ids is None:
+                logging.error("TOPOLOGY: cannot list the %s inventory nodes",
+                              'config' if config else 'operational')
+            node_ids.update(ids or [])
+        node_ids.update(data.get('topology_ids') or [])
+        nodes = data.get('fm')
+        if nodes is not None and 'nodes' in nodes and 'node' in nodes['nodes']:
+            node_ids.update([node['id'] for node in nodes['nodes']['node']])
+        node_ids = sorted([name for name in node_ids
+                           if name.startswith('openflow:')])
+
+        logging.debug("TOPOLOGY: fetching %d inventory nodes", len(node_ids))
+        data['config'], data['operational'] = openflow.get_openflow_sharded(
+            ctrl, node_ids, max_workers=self.inventory_workers,
+            retries=self.inventory_retries, backoff=self.inventory_backoff)
+
+    def _get_inventory_nodes(self, ctrl, data, config=True):
+        """Returns the config or operational inventory nodes.
+
+        When stream_inventory is set the nodes are parsed one at a time while
+        the response is read instead of loading the whole document.
+        """
+        if self.stream_inventory and not self.sharded_inventory:
+            return openflow.stream_openflow_nodes(ctrl, config=config)
+        nodes = data.get('config' if config else 'operational')
+        if nodes is not None and 'nodes' in nodes and 'node' in nodes['nodes']:
+            return nodes['nodes']['node']
+
+    def _load_inventory_nodes(self, nodes, source, group_key='group-id'):
+        """Adds the groups and flows of inventory nodes to the switches"""
+        for node in nodes:
+            name = node['id']
+            if not name.startswith('openflow:'):
+                continue
+            if not self.get_switch(name):
+                self.add_switch_by_openflow_name(name)
+            switch = self.get_switch(name)
+            groups = node.get('group') if 'group' in node else node.get(
+                'flow-node-inventory:group')
+            if groups:
+                for group in groups:
+                    getattr(switch.get_group(group[group_key]),
+                            'add_' + source)(group)
+
+            tables = node.get('table') if 'table' in node else node.get(
+                'flow-node-inventory:table')
+            if tables:
+                for table in tables:
+                    table_id = table['id']
+                    flows = table.get('flow') if 'flow' in table else table.get(
+                        'flow-node-inventory:flow')
+                    if flows:
+                        prefixes, ids, versions = decode_cookies(
+                            [flow.get('cookie') for flow in flows])
+                        for flow, prefix, fm_id, version in zip(flows, prefixes, ids, versions):
+                            if self.cookie_prefix is not None and prefix is not None and prefix != self.cookie_prefix:
+                                continue
+                            getattr(switch.get_flow(table=table_id, name=flow['id'], cookie=flow.get(
+                                'cookie'), fm_id=fm_id), 'add_' + source)(flow, (fm_id, version))
 
     def get_master_controller_name(self, name):
         logging.debug(self.switches_by_openflow_name)
@@ -576,26 +770,52 @@ class Topology(object):
                                 table=flow['table-id'], name=flow['flow-name']).mark_as_calculated()
 
 
-def _load_openflow_from_switch(switch):
-    groups = None
-    groups = switch.get_groups()
-    # try:
+def _get_switch_class(switch_type):
+    """Returns the class of a switch type, importing only its driver"""
+    if switch_type and switch_type == 'noviflow':
+        from flowmanager.noviflow import Noviflow
+        return Noviflow
+    from flowmanager.ovs import OVS
+    return OVS
+
 
-    # except:
-    #     logging.error("TOPOLOGY: error getting groups from %s(%s)",
-    #                   switch.name, switch.openflow_name)
-    #     pass
-    if groups:
-        for group in groups:
-            switch.get_group(group['id']).add_switch(group)
+class _SwitchLoader(threading.Thread):
 
-    flows = None
+    """Thread dumping switches with Topology.load_openflow_from_switches"""
+
+    def __init__(self, topology, switches):
+        threading.Thread.__init__(self)
+        self.topology = topology
+        self.switches = switches
+        self.results = []
+
+    def run(self):
+        if self.switches:
+            self.results = self.topology.load_openflow_from_switches(
+                self.switches)
+
+    def join(self, timeout=None):
+        threading.Thread.join(self, timeout)
+        return self.results
+
+
+def _load_openflow_from_switch(switch, prefix=None):
+    """Returns the groups and flows of a switch with their decoded cookies,
+    and the (name, error) of the dumps that failed.
+
+    A failed dump is None, so the other one is still loaded.
+    """
+    errors = []
+    try:
+        groups = switch.get_groups()
+    except Exception, msg:
+        logging.debug("TOPOLOGY: %s groups dump failed", switch.name, exc_info=True)
+        groups = None
+        errors.append(('groups', msg))
     try:
-        flows = switch.get_flows()
-    except:
-        logging.error("TOPOLOGY: error getting flows from %s(%s)",
-                      switch.name, switch.openflow_name)
-        pass
-    if flows:
-        for flow in flows:
-            switch.get_flow(cookie=flow['cookie']).add_switch(flow)
+        flows = switch.get_flows(prefix=prefix)
+    except Exception, msg:
+        logging.debug("TOPOLOGY: %s flows dump failed", switch.name, exc_info=True)
+        flows = None
+        errors.append(('flows', msg))
+    return groups, flows, decode_cookies([flow['cookie'] for flow in flows] if flows else []), errors
@@ -4,6 +4,10 @@ This class contains common methods to be consumed by all modules.
 
 """
 import logging
+import threading
+import time
+import Queue
+from collections import OrderedDict
 
 
 def check_mandatory_values(obj, names):
@@ -24,3 +28,126 @@ def contains_filters(filters=None, value=None):
         except Exception:
             logging.debug('Filter error')
     return True
+
+
+class TaskResult(object):
+
+    """Outcome of a task run by run_tasks"""
+
+    def __init__(self, key):
+        self.key = key
+        self.value = None
+        self.error = None
+        self.timed_out = False
+        self.elapsed = None
+
+    def ok(self):
+        return self.error is None and not self.timed_out
+
+
+def run_tasks(tasks, max_workers=8, timeout=None, progress=None):
+    """Runs (key, callable) tasks with at most max_workers running at once.
+
+    A task running for more than timeout seconds is recorded as timed out
+    right away, but its thread keeps its slot until it ends, so a hung
+    task still counts against max_workers, and its result is discarded.
+    Tasks must bound their own blocking calls. progress is called with the
+    TaskResult, the number of finished tasks and the total after each task.
+    Returns the TaskResult of every task in the same order as tasks.
+    """
+    results = OrderedDict()
+    for key, _ in tasks:
+        results[key] = TaskResult(key)
+    pending = list(tasks)
+    running = {}
+    # tasks recorded as timed out whose thread is still running
+    expired = set()
+    done = Queue.Queue()
+    max_workers = max(1, int(max_workers))
+
+    def run(key, func):
+        start = time.time()
+        value = None
+        error = None
+        try:
+            value = func()
+        except Exception, msg:
+            logging.debug("task %s failed", key, exc_info=True)
+            error = msg
+        done.put((key, value, error, time.time() - start))
+
+    finished = 0
+    while finished < len(results):
+        while pending and len(running) + len(expired) < max_workers:
+            key, func = pending.pop(0)
+            running[key] = time.time()
+            t = threading.Thread(target=run, args=(key, func))
+            t.daemon = True
+            t.start()
+
+        wait = 1
+        if timeout and running:
+            wait = max(0, min(running.values()) + timeout - time.time())
+        try:
+            key, value, error, elapsed = done.get(timeout=wait)
+        except Queue.Empty:
+            now = time.time()
+            for key, started in running.items():
+                if not timeout or now - started < timeout:
+                    continue
+                del running[key]
+                expired.add(key)
+                result = results[key]
+                result.timed_out = True
+                result.elapsed = now - started
+                finished += 1
+                if progress:
+                    progress(result, finished, len(results))
+            continue
+
+        if key in expired:
+            # late answer of a task already recorded as timed out
+            expired.discard(key)
+            continue
+        del running[key]
+        result = results[key]
+        result.value = value
+        result.error = error
+        result.elapsed = elapsed
+        finished += 1
+        if progress:
+            progress(result, finished, len(results))
+
+    return results.values()
+
+
+def run_tasks_in_order(tasks, callback, max_workers=8, timeout=None):
+    """Runs tasks like run_tasks, calling callback with every TaskResult in
+    the order of tasks as soon as it and the ones before it are finished"""
+    order = [key for key, _ in tasks]
+    finished = {}
+    position = [0]
+
+    def progress(result, count, total):
+        finished[result.key] = result
+        while position[0] < len(order) and order[position[0]] in finished:
+            callback(finished.pop(order[position[0]]))
+            position[0] += 1
+
+    return run_tasks(tasks, max_workers=max_workers, timeout=timeout,
+                     progress=progress)
+
+
+def run_parallel(tasks, max_workers=8):
+    """Runs (key, callable) tasks using at most max_workers threads.
+
+    Returns a dict with the result of every task by key. Tasks raising an
+    exception are logged and their result is None.
+    """
+    results = {}
+    for result in run_tasks(tasks, max_workers=max_workers):
+        if result.error is not None:
+            logging.error("error running task %s: %s",
+                          result.key, result.error)
+        results[result.key] = result.value
+    return results
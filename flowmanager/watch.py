@@ -0,0 +1,86 @@
+"""
+This module re-runs validations against a warm topology.
+
+The topology, its HTTP sessions and SSH sessions are kept between runs,
+only the state loaded by the previous run is reset. Runs happen every
+interval seconds or when the process receives SIGUSR1, and only the
+changes since the previous run are logged: checks becoming ok or failed,
+and findings that appeared or were resolved.
+
+"""
+import logging
+import signal
+import threading
+import time
+from flowmanager.snapshot import FindingsRecorder
+
+CHECKS = ['links', 'nodes', 'flows', 'roles', 'sync-status']
+
+
+class Watcher(object):
+
+    """Runs checks periodically logging their state transitions.
+
+    execute is called with the name of a check and returns its result.
+    """
+
+    def __init__(self, topology, checks, execute, interval=60):
+        self.topology = topology
+        self.checks = checks
+        self.execute = execute
+        self.interval = interval
+        self.results = {}
+        self.findings = {}
+        self.trigger = threading.Event()
+
+    def run(self):
+        """Runs until interrupted, returns the result of the last run"""
+        previous = signal.signal(signal.SIGUSR1, self._on_signal)
+        logging.info("WATCH: checking %s every %s seconds, send SIGUSR1 to check now",
+                     ', '.join(self.checks), self.interval)
+        try:
+            while True:
+                self.run_once()
+                self.trigger.wait(self.interval)
+                self.trigger.clear()
+        except KeyboardInterrupt:
+            logging.info("WATCH: stopped")
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+        return all(self.results.values())
+
+    def run_once(self):
+        """Runs every check once and logs what changed since the last run"""
+        start = time.time()
+        self.topology.reset()
+        for check in self.checks:
+            with FindingsRecorder(level=logging.WARNING, quiet=True) as recorder:
+                try:
+                    result = bool(self.execute(check))
+                except Exception, msg:
+                    logging.error("%s check failed: %s", check, msg)
+                    result = False
+            self._transition(check, result, recorder.findings)
+        logging.debug("WATCH: checks run in %.2f seconds",
+                      time.time() - start)
+
+    def _transition(self, check, result, findings):
+        if self.results.get(check) != result:
+            if result:
+                logging.info("WATCH: %s ok", check)
+            else:
+                logging.error("WATCH: %s failed", check)
+        self.results[check] = result
+
+        previous = self.findings.get(check, [])
+        current, known = set(findings), set(previous)
+        for level, message in findings:
+            if (level, message) not in known:
+                logging.log(level, "WATCH: %s", message)
+        for level, message in previous:
+            if (level, message) not in current:
+                logging.info("WATCH: resolved %s", message)
+        self.findings[check] = findings
+
+    def _on_signal(self, signum, frame):
+        self.trigger.set()
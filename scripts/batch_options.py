@@ -0,0 +1,61 @@
+"""
+Checks the batch lines giving the batch-wide options.
+
+Runs a batch started with -t prod.yml whose lines repeat the batch topology,
+name another one, the default one or none, and checks only the lines naming
+another topology than the batch fail, and every command runs with the
+options of the batch.
+
+Usage: python scripts/batch_options.py
+
+"""
+from __future__ import print_function
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import flowmanager.fmcheck as fmcheck
+from docopt.docopt import docopt
+
+
+class Topology(object):
+
+    def reset(self, invalidate_cache=True):
+        pass
+
+
+def main():
+    logging.basicConfig(level=logging.CRITICAL)
+    batch_arguments = docopt(fmcheck.__doc__, argv=[
+        'batch', 'lines.txt', '-t', 'prod.yml', '-c', '10.0.0.1'])
+    executed = []
+    fmcheck.execute = lambda topology, arguments: executed.append(
+        arguments) or True
+
+    failed = []
+    for line, ok in [
+            ('get-node-summary', True),
+            ('fmcheck get-node-summary -t prod.yml', True),
+            ('links -s --topology=prod.yml -c 10.0.0.1', True),
+            ('get-node-summary -t fm-topo.yml', False),
+            ('links -s -t other.yml', False),
+            ('links -s -c 10.0.0.2', False),
+            ('links -sd', False),
+            ('get-node-summary --format=jsonl', False)]:
+        del executed[:]
+        result = fmcheck.run_batch(Topology(), [line], batch_arguments)
+        if result != ok:
+            failed.append(line)
+        elif executed and any(executed[0][name] != batch_arguments[name]
+                              for name in fmcheck.BATCH_OPTIONS):
+            failed.append(line)
+        print('{:45} {}'.format(line, 'runs' if result else 'rejected'))
+
+    if failed:
+        sys.exit('unexpected result for: {}'.format(', '.join(failed)))
+
+
+if __name__ == '__main__':
+    main()